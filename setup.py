@@ -6,6 +6,8 @@ extras_require = {
         "pydot>=1.2.3",  # c.f. https://github.com/networkx/networkx/pull/2272
         "pygraphviz>=1.0,!=1.8",  # c.f. https://github.com/pygraphviz/pygraphviz/issues/395
     ],
+    "snapshot": ["msgpack>=1.0", "zstandard"],
+    "analytics": ["numpy"],
 }
 
 setup(extras_require=extras_require)
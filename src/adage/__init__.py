@@ -1,11 +1,11 @@
 import os
-import time
 import logging
 
 from adage.decorators import adageop, adagetask, Rule
 from adage.adageobject import adageobject
 from adage.pollingexec import setup_polling_execution
 from adage.wflowcontroller import BaseController
+from adage.asyncexec import arundag, AsyncController
 
 import adage.trackers as trackers
 
@@ -14,6 +14,8 @@ assert adageop
 assert adagetask
 assert Rule
 assert adageobject
+assert arundag
+assert AsyncController
 
 log = logging.getLogger(__name__)
 
@@ -29,7 +31,7 @@ def trackprogress(trackerlist, controller, method = 'track'):
     for t in trackerlist:
         getattr(t,method)(controller.adageobj)
 
-def run_polling_workflow(controller, coroutine, update_interval, trackerlist = None, maxsteps = None):
+def run_polling_workflow(controller, coroutine, update_interval, trackerlist = None, maxsteps = None, max_idle_interval = 1.0):
     '''
     run the polling-style workflow by periodically checkinng if a graph can be extended or any noted be submitted
     runs validation
@@ -38,6 +40,7 @@ def run_polling_workflow(controller, coroutine, update_interval, trackerlist = N
     :param coroutine: the adage coroutine to step through the workflow
     :param update_interval: time interval between workflow ticks
     :param trackerlist
+    :param max_idle_interval: maximum time between ticks while waiting for completion notifications of the backend
 
     :return: None
     :raises RuntimeError: if graph is finished and graph validation failed or workflow is failed (nodes unsuccessful)
@@ -55,7 +58,7 @@ def run_polling_workflow(controller, coroutine, update_interval, trackerlist = N
                 log.info('reached number of maximum iterations ({})'.format(maxsteps))
                 return
             log.debug('Tracking done.')
-            time.sleep(update_interval)
+            controller.wait(update_interval, max_idle_interval)
     except:
         log.exception('some weird exception caught in adage process loop')
         raise
@@ -90,7 +93,8 @@ def rundag(adageobj = None,
            default_trackers = True,
            additional_trackers = None,
            controller = None,
-           maxsteps = None):
+           maxsteps = None,
+           max_idle_interval = 1.0):
     '''
     Main adage entrypoint. It's a convenience wrapper around the main adage coroutine loop and
     sets up the backend, logging, tracking (for GIFs, Text Snapshots, etc..) and possible interactive
@@ -101,6 +105,7 @@ def rundag(adageobj = None,
     :param extend_decider: decision coroutine to deal with whether to extend the workflow graph
     :param submit_decider: decision coroutine to deal with whether to submit node tasks
     :param update_interval: minimum looping interval for main adage loop
+    :param max_idle_interval: maximum looping interval if the backend pushes completion notifications
     :param loggername: python logger to use
     :param trackevery: tracking interval for default simple report tracker
     :param workdir: workdir for default visual tracker
@@ -134,4 +139,4 @@ def rundag(adageobj = None,
         ## prep controller with backend
         controller = BaseController(adageobj, backend)
 
-    run_polling_workflow(controller, coroutine, update_interval, trackerlist, maxsteps)
+    run_polling_workflow(controller, coroutine, update_interval, trackerlist, maxsteps, max_idle_interval)
@@ -1,7 +1,89 @@
 import adage.graph
 
+class RuleList(object):
+    '''
+    insertion-ordered container of rules, keyed by rule identity. It offers the
+    list-like interface used for ``adageobject.rules`` but supports constant-time
+    removal of arbitrary rules. Iteration goes over a snapshot, so rules may be
+    added or removed while iterating.
+    '''
+    def __init__(self,rules = None):
+        self._rules = {}
+        self.extend(rules or [])
+
+    def append(self,rule):
+        self._rules[id(rule)] = rule
+
+    def extend(self,rules):
+        for rule in rules:
+            self.append(rule)
+
+    def __iadd__(self,rules):
+        self.extend(rules)
+        return self
+
+    def remove(self,rule):
+        if self._rules.get(id(rule)) is not rule:
+            raise ValueError('rule {} not in rule list'.format(rule))
+        del self._rules[id(rule)]
+
+    def pop(self,index = -1):
+        rule = self[index]
+        self.remove(rule)
+        return rule
+
+    def index(self,rule):
+        for i,x in enumerate(self):
+            if x is rule:
+                return i
+        raise ValueError('rule {} not in rule list'.format(rule))
+
+    def transfer(self,rules,target):
+        '''
+        move a batch of rules from this container to another list
+
+        :param rules: the rules to move
+        :param target: the list to which to append them (e.g. the applied rules)
+        '''
+        for rule in rules:
+            self.remove(rule)
+        target.extend(rules)
+
+    def __getitem__(self,index):
+        return list(self._rules.values())[index]
+
+    def __iter__(self):
+        return iter(list(self._rules.values()))
+
+    def __len__(self):
+        return len(self._rules)
+
+    def __contains__(self,rule):
+        return self._rules.get(id(rule)) is rule
+
+    def __eq__(self,other):
+        return list(self) == list(other)
+
+    def __repr__(self):
+        return '<RuleList: {}>'.format(list(self._rules.values()))
+
 class adageobject(object):
-    def __init__(self,dag = None, rules = None, applied_rules = None):
-        self.dag = dag or adage.graph.AdageDAG()
+    def __init__(self,dag = None, rules = None, applied_rules = None, dagclass = adage.graph.AdageDAG):
+        '''
+        :param dag: the workflow graph (default: a new, empty graph)
+        :param rules: the rules not yet applied
+        :param applied_rules: the rules already applied
+        :param dagclass: the graph store used to create a new graph, e.g. :class:`adage.graph.ArrayDAG`
+            for very large workflows
+        '''
+        self.dag = dag if dag is not None else dagclass()
         self.rules = rules or []
         self.applied_rules = applied_rules or []
+
+    @property
+    def rules(self):
+        return self._rules
+
+    @rules.setter
+    def rules(self,rules):
+        self._rules = rules if isinstance(rules,RuleList) else RuleList(rules)
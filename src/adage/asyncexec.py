@@ -0,0 +1,241 @@
+import asyncio
+import inspect
+import functools
+import logging
+import threading
+
+from adage.graph import DAGObserver
+from adage.pollingexec import setup_deciders
+from adage.wflowcontroller import BaseController
+
+log = logging.getLogger(__name__)
+
+def _resolve(future,state):
+    if not future.done():
+        future.set_result(state)
+
+class ReadinessFutures(DAGObserver):
+    '''
+    asyncio futures resolving once a node reached a terminal state (successful or failed).
+    The node states are updated by the controller steps running in the executor, so the
+    futures are resolved through their event loop.
+    '''
+    def __init__(self,dag):
+        self.dag = dag
+        self.futures = {}
+        self._lock = threading.Lock()
+        dag.addObserver(self)
+
+    def detach(self):
+        self.dag.removeObserver(self)
+
+    def watch(self,nodeobj):
+        '''
+        :return: a future (of the running event loop) resolving to the terminal state of the node
+        '''
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        with self._lock:
+            if nodeobj.ready():
+                future.set_result(nodeobj.state)
+            else:
+                self.futures.setdefault(nodeobj.identifier,[]).append((loop,future))
+        return future
+
+    def state_changed(self,nodeobj,oldstate):
+        if not nodeobj.ready():
+            return
+        with self._lock:
+            waiting = self.futures.pop(nodeobj.identifier,[])
+        for loop, future in waiting:
+            loop.call_soon_threadsafe(_resolve, future, nodeobj.state)
+
+    def node_removed(self,nodeobj):
+        with self._lock:
+            waiting = self.futures.pop(nodeobj.identifier,[])
+        for loop, future in waiting:
+            loop.call_soon_threadsafe(future.cancel)
+
+class AsyncController(BaseController):
+    '''
+    workflow controller for use within an asyncio event loop. Waiting for the
+    workflow state to change suspends the calling task instead of blocking the thread.
+
+    The controller steps talking to the backend or running rules (:meth:`sync_backend`,
+    :meth:`applicable_rules`, :meth:`apply_rules`, :meth:`submit_nodes`) are blocking;
+    :func:`arun_workflow` runs them in the default executor of the event loop
+    (c.f. :func:`in_executor`).
+    '''
+    observer_types = dict(BaseController.observer_types, readiness = ReadinessFutures)
+
+    def node_ready(self, nodeobj):
+        '''
+        :param nodeobj: a node of the workflow graph
+        :return: a future resolving to the terminal state of the node once the controller
+            synchronized it with the backend
+        '''
+        return self._observer('readiness').watch(nodeobj)
+
+    async def wait_async(self, update_interval, max_idle_interval = None):
+        '''
+        asyncio version of :meth:`BaseController.wait`
+        '''
+        completions, timeout = self._completion_wait(max_idle_interval)
+        if completions is None:
+            await asyncio.sleep(update_interval)
+            return
+        await completions.wait_async(timeout)
+
+async def maybe_await(value):
+    if inspect.isawaitable(value):
+        return await value
+    return value
+
+async def in_executor(func, *args):
+    '''
+    run a blocking call (e.g. a controller step) in the default executor of the event
+    loop, so that other workflows on the same loop progress in the meantime
+    '''
+    return await asyncio.get_running_loop().run_in_executor(None, functools.partial(func, *args))
+
+async def decide(decider, data):
+    '''
+    adapter to ask a decider. Deciders can either be primed generator coroutines
+    (as used by :func:`adage.pollingexec.setup_polling_execution`) or callables
+    taking the data as argument, which may be async.
+    '''
+    if hasattr(decider,'send'):
+        return await maybe_await(decider.send(data))
+    return await maybe_await(decider(data))
+
+async def atrackprogress(trackerlist, controller, method = 'track'):
+    '''
+    asyncio version of :func:`adage.trackprogress`. Tracker methods may be async.
+    '''
+    for t in trackerlist or []:
+        await maybe_await(getattr(t,method)(controller.adageobj))
+
+async def aupdate_dag(controller, decider, recurse):
+    '''
+    asyncio version of :func:`adage.pollingexec.update_dag`
+    '''
+    rules = []
+    for possible_rule in await in_executor(controller.applicable_rules):
+        log.debug('we could update this with rule: %s',possible_rule)
+        if await decide(decider, (possible_rule,controller)):
+            rules.append(possible_rule)
+    if rules:
+        log.debug('extending graph.')
+        await in_executor(controller.apply_rules, rules)
+    if rules and recurse:
+        await in_executor(controller.sync_backend)
+        await aupdate_dag(controller, decider, recurse)
+
+async def aprocess_dag(controller, decider):
+    '''
+    asyncio version of :func:`adage.pollingexec.process_dag`
+    '''
+    nodes = []
+    for nodeobj in controller.submittable_nodes():
+        do_submit = await decide(decider, (nodeobj,controller))
+        log.debug('node submittable %s and decision to submit %s', nodeobj, do_submit)
+        if do_submit:
+            nodes.append(nodeobj)
+    if nodes:
+        log.info('submitting nodes %s', nodes)
+        await in_executor(controller.submit_nodes, nodes)
+
+async def await_update(controller, update_interval, max_idle_interval):
+    if hasattr(controller,'wait_async'):
+        await controller.wait_async(update_interval, max_idle_interval)
+    else:
+        await asyncio.sleep(update_interval)
+
+async def arun_workflow(controller,
+                        extend_decider,
+                        submit_decider,
+                        finish_decider,
+                        recursive_updates = True,
+                        update_interval = 0.01,
+                        trackerlist = None,
+                        maxsteps = None,
+                        max_idle_interval = 1.0):
+    '''
+    asyncio version of the polling-style workflow loop going through the
+    update->submit->sync cycle. Deciders must already be set up (c.f. :func:`decide`).
+    The blocking controller steps run in the default executor of the event loop, one at
+    a time per workflow, while deciders and trackers run on the loop itself.
+
+    :return: None
+    :raises RuntimeError: if graph is finished and graph validation failed or workflow is failed (nodes unsuccessful)
+    '''
+    log.info('starting async state loop.')
+    stepnum = 0
+    try:
+        await atrackprogress(trackerlist, controller, method = 'initialize')
+        while True:
+            finished, success = await decide(finish_decider, controller)
+            log.debug('workflow status finished: %s status: %s', finished, success)
+            if finished:
+                if not success:
+                    raise RuntimeError('workflow finished but failed')
+                break
+            await in_executor(controller.sync_backend)
+            await aupdate_dag(controller, extend_decider, recursive_updates)
+            await aprocess_dag(controller, submit_decider)
+            await atrackprogress(trackerlist, controller)
+            stepnum += 1
+            if maxsteps and stepnum == maxsteps:
+                log.info('reached number of maximum iterations ({})'.format(maxsteps))
+                return
+            await await_update(controller, update_interval, max_idle_interval)
+    except:
+        log.exception('some weird exception caught in adage process loop')
+        raise
+    finally:
+        await atrackprogress(trackerlist, controller, method = 'finalize')
+
+    log.info('adage state loop done.')
+
+    if not controller.validate():
+        raise RuntimeError('DAG execution not validating')
+    log.info('execution valid. (in terms of execution order)')
+
+    log.info('workflow completed successfully.')
+
+async def arundag(adageobj = None,
+                  backend = None,
+                  extend_decider = None,
+                  submit_decider = None,
+                  finish_decider = None,
+                  recursive_updates = True,
+                  update_interval = 0.01,
+                  loggername = __name__,
+                  trackevery = 1,
+                  workdir = None,
+                  default_trackers = True,
+                  additional_trackers = None,
+                  controller = None,
+                  maxsteps = None,
+                  max_idle_interval = 1.0):
+    '''
+    asyncio entrypoint, the counterpart of :func:`adage.rundag`. Many workflows can run
+    concurrently on the same event loop. Parameters are the same as for :func:`adage.rundag`,
+    but deciders and trackers may also be async callables.
+    '''
+    from adage import default_trackerlist
+
+    extend_decider, submit_decider, finish_decider = setup_deciders(extend_decider, submit_decider, finish_decider)
+
+    trackerlist = default_trackerlist(workdir, loggername, trackevery) if default_trackers else []
+    if additional_trackers:
+        trackerlist += additional_trackers
+
+    if adageobj:
+        if not backend:
+            from .backends import MultiProcBackend
+            backend = MultiProcBackend(2)
+        controller = AsyncController(adageobj, backend)
+
+    await arun_workflow(controller, extend_decider, submit_decider, finish_decider,
+                        recursive_updates, update_interval, trackerlist, maxsteps, max_idle_interval)
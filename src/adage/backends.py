@@ -1,13 +1,134 @@
+import asyncio
 import multiprocessing
+import queue
 import sys
+import threading
 import traceback
 
+import adage.nodestate as nodestate
+
+def proxy_status(backend,resultproxy):
+    '''
+    :return: the node state corresponding to a result proxy, using the per-proxy backend methods
+    '''
+    if not backend.ready(resultproxy):
+        return nodestate.RUNNING
+    return nodestate.SUCCESS if backend.successful(resultproxy) else nodestate.FAILED
+
+class CompletionQueue(object):
+    '''
+    thread-safe queue of completion notifications. Backends that can push
+    notifications expose one as their ``completions`` attribute and feed it
+    (usually from a callback thread) whenever a task finished, so that the
+    main loop can block on it instead of polling.
+    '''
+    def __init__(self):
+        self.queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._async_waiters = []
+
+    def notify(self,*args,**kwargs):
+        self.queue.put(True)
+        with self._lock:
+            for loop, event in self._async_waiters:
+                loop.call_soon_threadsafe(event.set)
+
+    def _drain(self):
+        ncompleted = 0
+        while True:
+            try:
+                self.queue.get_nowait()
+            except queue.Empty:
+                return ncompleted
+            ncompleted += 1
+
+    def wait(self,timeout = None):
+        '''
+        block until at least one task finished or the timeout expired
+
+        :param timeout: maximum time to wait in seconds
+        :return: number of completions that were announced
+        '''
+        try:
+            self.queue.get(timeout = timeout)
+        except queue.Empty:
+            return 0
+        return 1 + self._drain()
+
+    async def wait_async(self,timeout = None):
+        '''
+        like :meth:`wait` but suspends the calling asyncio task instead of blocking the thread
+        '''
+        waiter = (asyncio.get_running_loop(), asyncio.Event())
+        with self._lock:
+            self._async_waiters.append(waiter)
+        try:
+            if self.queue.empty():
+                await asyncio.wait_for(waiter[1].wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            with self._lock:
+                self._async_waiters.remove(waiter)
+        return self._drain()
+
+class _Submission(object):
+    '''
+    a task handed to the pool, whose result proxy is only known once the submission returned
+    '''
+    def __init__(self):
+        self.proxy = None
+        self.submitted = threading.Event()
+
 class MultiProcBackend(object):
-    def __init__(self,poolsize):
+    def __init__(self,poolsize, capacity = None):
+        '''
+        :param poolsize: number of worker processes
+        :param capacity: resources available to the tasks (default: one cpu per worker process)
+        '''
         self.pool = multiprocessing.Pool(poolsize)
+        self.completions = CompletionQueue()
+        self._capacity = capacity or {'cpu': poolsize}
+        self._finished = queue.Queue()
+        self._announcer = threading.Thread(target = self._announce_finished, daemon = True)
+        self._announcer.start()
+
+    def _announce_finished(self):
+        '''
+        the pool calls the callbacks of a task right before its result is marked as ready,
+        so the completions are announced from this thread once the results are ready
+        '''
+        while True:
+            submission = self._finished.get()
+            if submission is None:
+                return
+            submission.submitted.wait()
+            submission.proxy.wait()
+            self.completions.notify()
+
+    def capacity(self):
+        return self._capacity
+
+    def close(self):
+        '''
+        waits for the submitted tasks to finish and shuts down the worker processes
+        '''
+        self.pool.close()
+        self.pool.join()
+        self._finished.put(None)
+        self._announcer.join()
 
     def submit(self,task):
-        return self.pool.apply_async(task)
+        submission = _Submission()
+        finished = lambda value: self._finished.put(submission)
+        submission.proxy = self.pool.apply_async(task, callback = finished, error_callback = finished)
+        submission.submitted.set()
+        return submission.proxy
+
+    def submit_many(self,tasks):
+        # the pool has no bulk submission with per-task results, but handing
+        # a task to the pool is only a local queue operation anyway
+        return [self.submit(task) for task in tasks]
 
     def result(self,resultproxy):
         return resultproxy.get()
@@ -19,6 +140,9 @@ class MultiProcBackend(object):
         if not self.ready(resultproxy): return False
         return resultproxy.successful()
 
+    def status_many(self,resultproxies):
+        return [proxy_status(self,proxy) for proxy in resultproxies]
+
     def fail_info(self,resultproxy):
         try:
             self.result(resultproxy)
@@ -28,12 +152,39 @@ class MultiProcBackend(object):
             return (t,v)
 
 class CeleryBackend(object):
-    def __init__(self,app):
+    def __init__(self,app, listen = False):
+        '''
+        :param app: the celery app
+        :param listen: push completion notifications by listening to the task events
+            of the workers (requires workers to send events, i.e. run them with ``-E``)
+        '''
         self.app = app
+        self.completions = None
+        if listen:
+            self.completions = CompletionQueue()
+            self._listener = threading.Thread(target = self._listen)
+            self._listener.daemon = True
+            self._listener.start()
+
+    def _listen(self):
+        handlers = {event: self.completions.notify for event in ['task-succeeded','task-failed','task-revoked']}
+        with self.app.connection() as connection:
+            receiver = self.app.events.Receiver(connection, handlers = handlers)
+            receiver.capture(limit = None, timeout = None, wakeup = True)
+
     def submit(self,task):
         self.app.set_current()
         return task.func.celery.apply_async(task.args,task.kwargs,throw = False)
 
+    def submit_many(self,tasks):
+        '''
+        publish many tasks at once as a celery group, sharing a single producer
+        '''
+        from celery import group
+        self.app.set_current()
+        signatures = [task.func.celery.s(*task.args,**task.keywords) for task in tasks]
+        return group(signatures).apply_async().results
+
     def result(self,resultproxy):
         return resultproxy.get()
 
@@ -43,6 +194,28 @@ class CeleryBackend(object):
     def successful(self,resultproxy):
         return resultproxy.successful()
 
+    def status_many(self,resultproxies):
+        '''
+        query the states of many tasks at once. For key-value result backends (e.g. redis)
+        this is a single multi-key lookup instead of one round trip per task.
+        '''
+        from celery import states
+        resultbackend = self.app.backend
+        if not (hasattr(resultbackend,'mget') and hasattr(resultbackend,'get_key_for_task')):
+            return [proxy_status(self,proxy) for proxy in resultproxies]
+
+        values = resultbackend.mget([resultbackend.get_key_for_task(proxy.id) for proxy in resultproxies])
+        statuses = []
+        for value in values:
+            status = resultbackend.decode_result(value)['status'] if value else states.PENDING
+            if status == states.SUCCESS:
+                statuses.append(nodestate.SUCCESS)
+            elif status in states.READY_STATES:
+                statuses.append(nodestate.FAILED)
+            else:
+                statuses.append(nodestate.RUNNING)
+        return statuses
+
     def fail_info(self,resultproxy):
         try:
             self.result(resultproxy)
@@ -50,6 +223,32 @@ class CeleryBackend(object):
             return sys.exc_info()
 
 
+def _call_task(task,resolve):
+    if resolve:
+        return task.func(*task.args,**task.keywords)
+    return task()
+
+class MappedResultProxy(object):
+    '''
+    result proxy for a single task submitted through a map request, unwrapping
+    the one-element result list of its chunk
+    '''
+    def __init__(self,asyncresult):
+        self.asyncresult = asyncresult
+        self.msg_ids = asyncresult.msg_ids
+
+    def get(self):
+        return self.asyncresult.get()[0]
+
+    def ready(self):
+        return self.asyncresult.ready()
+
+    def successful(self):
+        return self.asyncresult.successful()
+
+    def exception_info(self):
+        return self.asyncresult.exception_info()
+
 class IPythonParallelBackend(object):
     def __init__(self,client, resolve_like_partial = False):
         self.client = client
@@ -61,6 +260,14 @@ class IPythonParallelBackend(object):
             return self.view.apply(task.func,*task.args,**task.keywords)
         return self.view.apply(task)
 
+    def submit_many(self,tasks):
+        '''
+        submit many tasks with a single map request to the load-balanced view. Each task
+        becomes its own message, so every node still gets its own result proxy.
+        '''
+        mapped = self.view.map_async(_call_task, tasks, [self.resolve]*len(tasks), chunksize = 1)
+        return [MappedResultProxy(self.client.get_result(msg_id, block = False)) for msg_id in mapped.msg_ids]
+
     def result(self,resultproxy):
         return resultproxy.get()
 
@@ -70,6 +277,26 @@ class IPythonParallelBackend(object):
     def successful(self,resultproxy):
         return resultproxy.successful()
 
+    def status_many(self,resultproxies):
+        '''
+        query the states of many tasks at once from the metadata the client received
+        (without fetching any results). Proxies of tasks the client does not know
+        about (e.g. submitted by another client) fall back to the per-proxy methods.
+        '''
+        self.client.spin()
+        outstanding, metadata = self.client.outstanding, self.client.metadata
+        statuses = []
+        for proxy in resultproxies:
+            if outstanding.intersection(proxy.msg_ids):
+                statuses.append(nodestate.RUNNING)
+            elif not all('status' in metadata.get(msg_id,{}) for msg_id in proxy.msg_ids):
+                statuses.append(proxy_status(self,proxy))
+            elif all(metadata[msg_id]['status'] == 'ok' for msg_id in proxy.msg_ids):
+                statuses.append(nodestate.SUCCESS)
+            else:
+                statuses.append(nodestate.FAILED)
+        return statuses
+
     def fail_info(self,resultproxy):
         return resultproxy.exception_info()
 
@@ -0,0 +1,255 @@
+import time
+import logging
+
+import adage.nodestate as nodestate
+from adage.graph import DAGObserver
+
+log = logging.getLogger(__name__)
+
+class CompositeTask(object):
+    '''
+    a single backend task running the tasks of several nodes in one worker call.
+    For every task it records whether it succeeded, its result (or the exception)
+    and its start and end time.
+    '''
+    def __init__(self,tasks,stop_on_failure = True):
+        '''
+        :param tasks: the node tasks in the order in which to run them
+        :param stop_on_failure: do not run the remaining tasks once one failed (e.g. for chains)
+        '''
+        self.tasks = tasks
+        self.stop_on_failure = stop_on_failure
+
+    def __call__(self):
+        outcomes = []
+        for task in self.tasks:
+            start = time.time()
+            try:
+                outcomes.append((True, task(), start, time.time()))
+            except Exception as e:
+                outcomes.append((False, e, start, time.time()))
+                if self.stop_on_failure:
+                    break
+        return outcomes
+
+class CompositeResult(object):
+    '''
+    the result proxy of a submitted composite task, caching the per-task outcomes
+    '''
+    def __init__(self,backend,proxy):
+        self.backend = backend
+        self.proxy = proxy
+        self._outcomes = None
+
+    def ready(self):
+        return self.backend.ready(self.proxy)
+
+    def successful(self):
+        return self.backend.successful(self.proxy)
+
+    def outcomes(self):
+        if self._outcomes is None:
+            self._outcomes = self.backend.result(self.proxy) if self.successful() else []
+        return self._outcomes
+
+class CompositeMemberProxy(object):
+    '''
+    result proxy of a node whose task was submitted as part of a composite task
+    '''
+    def __init__(self,composite,index,identifier = None):
+        self.composite = composite
+        self.index = index
+        self.identifier = identifier
+
+    def outcome(self):
+        '''
+        :return: the (success, result, start, end) tuple of the node's task, None if it did not run
+        '''
+        outcomes = self.composite.outcomes()
+        return outcomes[self.index] if self.index < len(outcomes) else None
+
+class CompositeBackend(object):
+    '''
+    backend adapter connected to the member nodes of composite tasks, splitting the
+    composite result back into the results and failures of the individual nodes.
+    Members that were not run because an earlier member failed are reported as
+    ``DEFINED`` by :meth:`status_many`, i.e. withdrawn without being run.
+    '''
+    def ready(self,resultproxy):
+        return resultproxy.composite.ready()
+
+    def successful(self,resultproxy):
+        outcome = resultproxy.outcome()
+        return bool(outcome and outcome[0])
+
+    def result(self,resultproxy):
+        return resultproxy.outcome()[1]
+
+    def status_many(self,resultproxies):
+        statuses = []
+        for proxy in resultproxies:
+            composite = proxy.composite
+            if not composite.ready():
+                statuses.append(nodestate.RUNNING)
+            elif not composite.successful():
+                statuses.append(nodestate.FAILED)
+            else:
+                outcome = proxy.outcome()
+                if outcome is None:
+                    statuses.append(nodestate.DEFINED)
+                else:
+                    statuses.append(nodestate.SUCCESS if outcome[0] else nodestate.FAILED)
+        return statuses
+
+    def fail_info(self,resultproxy):
+        composite = resultproxy.composite
+        if not composite.successful():
+            return composite.backend.fail_info(composite.proxy)
+        error = resultproxy.outcome()[1]
+        return (type(error), error)
+
+class CompositeTracker(DAGObserver):
+    '''
+    restores the timestamps of composite members from the times recorded by the worker
+    once they are ready, so that the execution order of the individual nodes can
+    still be validated
+    '''
+    def __init__(self,dag):
+        self.dag = dag
+        dag.addObserver(self)
+
+    def detach(self):
+        self.dag.removeObserver(self)
+
+    def state_changed(self,nodeobj,oldstate):
+        if not (nodeobj.ready() and isinstance(nodeobj.resultproxy,CompositeMemberProxy)):
+            return
+        if nodeobj.resultproxy.identifier != nodeobj.identifier:
+            # the node shares the result of another node (deduplicated task)
+            return
+        outcome = nodeobj.resultproxy.outcome()
+        if outcome:
+            nodeobj.submit_time, nodeobj.ready_by_time = outcome[2], outcome[3]
+
+def find_chain(dag,nodeobj,watched = None):
+    '''
+    :param dag: graph object
+    :param nodeobj: the head of the chain
+    :param watched: function telling whether a node is watched by a rule, which ends the chain
+    :return: the linear chain of unsubmitted nodes starting at the node, in which each
+        node except the last has exactly one successor, whose only predecessor it is
+    '''
+    watched = watched or (lambda x: False)
+    chain = [nodeobj]
+    while not watched(chain[-1]):
+        successors = list(dag.successors(chain[-1].identifier))
+        if len(successors) != 1:
+            break
+        nextnode = dag.getNode(successors[0])
+        if nextnode.submit_time or len(list(dag.predecessors(nextnode.identifier))) != 1:
+            break
+        chain.append(nextnode)
+    return chain
+
+def submit_composites(groups,backend,stop_on_failure = True):
+    '''
+    submit each group of nodes as one composite task
+
+    :param groups: list of lists of node objects
+    :param backend: the task execution backend
+    :param stop_on_failure: do not run the remaining tasks of a group once one failed
+    :return: the number of composite tasks submitted
+    '''
+    adapter = CompositeBackend()
+    for nodeobjs in groups:
+        task = CompositeTask([nodeobj.task for nodeobj in nodeobjs], stop_on_failure)
+        composite = CompositeResult(backend, backend.submit(task))
+        submit_time = time.time()
+        for index, nodeobj in enumerate(nodeobjs):
+            nodeobj.resultproxy = CompositeMemberProxy(composite, index, nodeobj.identifier)
+            nodeobj.backend = adapter
+            nodeobj.submit_time = submit_time
+        log.debug('submitted composite of %s nodes', len(nodeobjs))
+    return len(groups)
+
+def batch_key(nodeobj):
+    '''
+    :return: the function wrapped by the node's task (for partials such as created
+        by ``adagetask``'s ``.s``), None if the task can not be batched
+    '''
+    return getattr(nodeobj.task,'func',None)
+
+class MicroBatcher(object):
+    '''
+    coalesces ready sibling nodes whose tasks wrap the same function into batches,
+    each of which is submitted as a single composite task. Small groups are held
+    back for up to ``max_wait`` seconds to give more siblings the chance to become
+    ready.
+    '''
+    def __init__(self,max_batch,max_wait = 0):
+        '''
+        :param max_batch: maximum number of tasks per batch
+        :param max_wait: maximum time in seconds to hold back an incomplete batch
+        '''
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.first_seen = {}
+
+    @property
+    def holding(self):
+        return len(self.first_seen)
+
+    def _groups(self,nodeobjs):
+        groups, singles = {}, []
+        for nodeobj in nodeobjs:
+            key = batch_key(nodeobj)
+            if key is None:
+                singles.append(nodeobj)
+            else:
+                groups.setdefault(key,[]).append(nodeobj)
+        return groups, singles
+
+    def hold(self,nodeobjs):
+        '''
+        :param nodeobjs: the nodes that are ready to be submitted
+        :return: the nodes to submit now. Siblings that do not fill a complete batch are
+            held back until the oldest of them waited for ``max_wait`` seconds.
+        '''
+        now = time.time()
+        groups, _ = self._groups(nodeobjs)
+        held = set()
+        for members in groups.values():
+            remainder = members[len(members) - len(members) % self.max_batch:]
+            if not remainder:
+                continue
+            oldest = min(self.first_seen.setdefault(nodeobj.identifier, now) for nodeobj in remainder)
+            if now - oldest < self.max_wait:
+                held.update(nodeobj.identifier for nodeobj in remainder)
+        submit = [nodeobj for nodeobj in nodeobjs if nodeobj.identifier not in held]
+        for nodeobj in submit:
+            self.first_seen.pop(nodeobj.identifier, None)
+        return submit
+
+    def slots(self,nodeobjs):
+        '''
+        :return: dictionary of node identifiers to the batch the node would be part of
+            if the nodes were grouped by :meth:`group`
+        '''
+        groups, _ = self._groups(nodeobjs)
+        return {nodeobj.identifier: (key, index // self.max_batch)
+                for key, members in groups.items() for index, nodeobj in enumerate(members)}
+
+    def group(self,nodeobjs):
+        '''
+        :return: tuple of the batches (lists of at least two nodes) and the remaining single nodes
+        '''
+        groups, singles = self._groups(nodeobjs)
+        batches = []
+        for members in groups.values():
+            for i in range(0, len(members), self.max_batch):
+                batch = members[i:i+self.max_batch]
+                if len(batch) > 1:
+                    batches.append(batch)
+                else:
+                    singles.extend(batch)
+        return batches, singles
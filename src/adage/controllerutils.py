@@ -1,4 +1,3 @@
-import networkx as nx
 import logging
 import time
 import datetime
@@ -55,7 +54,7 @@ def nodes_left_or_rule_applicable(adageobj):
     log.debug('nodes we could run: %s',nodes_we_could_run)
     if nodes_running_or_defined:
         log.debug('%s nodes that could be run or are running are left.',len(nodes_running_or_defined))
-        log.debug('nodes are: %s', [dag.nodes[n] for n in nodes_running_or_defined])
+        log.debug('nodes are: %s', [dag.getNode(n) for n in nodes_running_or_defined])
         return True
 
     if any(rule.applicable(adageobj) for rule in rules):
@@ -73,7 +72,7 @@ def submittable_nodes(adageobj):
     '''
     log.debug("process DAG")
     dag = adageobj.dag
-    for node in nx.topological_sort(dag):
+    for node in dag.topologicalSort():
         nodeobj = dag.getNode(node)
         log.debug("working on node: %s with obj %s",node,nodeobj)
         if nodeobj.submit_time:
@@ -91,8 +90,18 @@ def submit_nodes(nodeobjs,backend):
     :param backend: the task execution backend
     :return: None
 
-    basic submission of a task associated to a given node object
+    basic submission of a task associated to a given node object. If the backend
+    provides a ``submit_many`` method, all tasks are handed over in a single call.
     '''
+    if hasattr(backend,'submit_many'):
+        if not nodeobjs:
+            return
+        proxies = backend.submit_many([nodeobj.task for nodeobj in nodeobjs])
+        submit_time = time.time()
+        for nodeobj, proxy in zip(nodeobjs, proxies):
+            nodeobj.resultproxy = proxy
+            nodeobj.submit_time = submit_time
+        return
 
     for nodeobj in nodeobjs:
         # log.info('submitting node %s', nodeobj)
@@ -125,31 +134,48 @@ def apply_rules(adageobj, rules):
     for rule in rules:
         # log.info('applying rule %s', rule)
         rule.apply(adageobj)
-        rule_index = adageobj.rules.index(rule)
-        log.debug('popping rule at index %s', rule_index)
-        adageobj.applied_rules.append(adageobj.rules.pop(rule_index))
+        adageobj.rules.transfer([rule], adageobj.applied_rules)
 
+def bulk_status(nodes,backend = None):
+    '''
+    query the status of the result proxies of many nodes at once, for all backends
+    that provide a bulk ``status_many`` method
+
+    :param nodes: list of node objects
+    :param backend: the task execution backend (if the nodes are not connected to one)
+    :return: dictionary mapping node identifiers to the reported state
+    '''
+    groups = {}
+    for nodeobj in nodes:
+        nodebackend = nodeobj.backend or backend
+        if nodeobj.resultproxy and hasattr(nodebackend,'status_many'):
+            groups.setdefault(id(nodebackend),(nodebackend,[]))[1].append(nodeobj)
 
-def sync_state(adageobj,backend = None):
+    statuses = {}
+    for nodebackend, nodeobjs in groups.values():
+        reported = nodebackend.status_many([nodeobj.resultproxy for nodeobj in nodeobjs])
+        for nodeobj, status in zip(nodeobjs, reported):
+            statuses[nodeobj.identifier] = status
+    return statuses
+
+def sync_state(adageobj,backend = None, nodes = None):
     '''
     Synchronize with Backend to update node processing status
 
     :param adageobj: the adage workflow object
+    :param backend: the task execution backend
+    :param nodes: optional list of node objects to restrict the update to (default: all nodes)
     :return: None
     '''
     # log.info('sync state against backend')
-    for node in adageobj.dag.nodes():
+    dag = adageobj.dag
+    if nodes is None:
+        nodes = [dag.getNode(node) for node in dag.nodes()]
+    statuses = bulk_status(nodes, backend)
+    for nodeobj in nodes:
         #check node status one last time so we pick up the finishing times
-        adageobj.dag.getNode(node).update_state(backend = backend)
-
-def update_coroutine(adageobj):
-    '''
-    loops over applicable coroutines, applies them and manages the bookkeeping (moving rules from 'open' to 'applied')
-    :param adageobj: the adage workflow object
-    '''
-    for i,rule in applicable_rules(adageobj):
-        do_apply = yield rule
-        if do_apply:
-            log.debug('extending graph.')
-            apply_rules(adageobj, [rule])
-        yield
+        oldstate, submitted = nodeobj.state, nodeobj.submit_time
+        nodeobj.update_state(backend = backend, status = statuses.get(nodeobj.identifier))
+        # also announce nodes withdrawn by the backend, which may stay DEFINED
+        if nodeobj.state != oldstate or (submitted and not nodeobj.submit_time):
+            dag.stateChanged(nodeobj, oldstate)
@@ -27,14 +27,17 @@ def upstream_ready(dag,nodeobj):
     return all(dag.getNode(x).ready() for x in upstream)
 
 def upstream_failure(dag,nodeobj):
-    upstream = [dag.getNode(x) for x in dag.predecessors(nodeobj.identifier)]
-    if not upstream:
-        return False
+    '''
+    :param dag: graph object
+    :param nodeobj: the node object
+    :return:
 
-    log.debug('checking upstream nodes %s',upstream)
-    upstream_status = [node_ran_and_failed(obj) or upstream_failure(dag,obj) for obj in upstream]
-    log.debug('upstream %s', 'ok' if upstream_status else 'failed')
-    return any(upstream_status)
+        - ``True`` if any of the nodes upstream of the node failed
+        - ``False`` in all other cases
+
+    the flag is maintained incrementally by the graph as nodes fail or edges are added
+    '''
+    return dag.upstreamFailed(nodeobj)
 
 def node_status(nodeobj):
     '''
@@ -14,9 +14,16 @@ def adageop(func):
     return func
 
 class Rule(object):
-    def __init__(self,predicate,body):
+    def __init__(self,predicate,body,watches = None):
+        '''
+        :param predicate: function of the adage object deciding whether the rule can be applied
+        :param body: function of the adage object applying the rule
+        :param watches: optional list of node identifiers the predicate depends on. If given,
+            the predicate is only re-evaluated when one of these nodes changes its state.
+        '''
         self.predicate = predicate
         self.body = body
+        self.watches = watches
 
     def applicable(self,adageobj):
         return self.predicate(adageobj)
@@ -24,13 +31,28 @@ class Rule(object):
     def apply(self,adageobj):
         return self.body(adageobj = adageobj)
 
-def adagetask(func):
+def adagetask(func = None, runtime_estimate = None, resources = None):
     """
     Decorator that adds a 's' attribute to a function
     The attribute can be used to fully define a function
     call to be executed at a later time. The result
     will be a zero-argument callable
+
+    When used with keyword arguments, scheduling metadata
+    is attached to the function, e.g.
+    ``@adagetask(runtime_estimate = 10)`` declares the
+    expected runtime used to prioritize the critical path
+    and ``@adagetask(resources = {'cpu': 8, 'memory': 20e9})``
+    the resources a call of the function needs
     """
+    if func is None:
+        return functools.partial(adagetask, runtime_estimate = runtime_estimate, resources = resources)
+
+    if runtime_estimate is not None:
+        func.runtime_estimate = runtime_estimate
+    if resources is not None:
+        func.resources = resources
+
     try:
         from celery import shared_task
         func.celery = shared_task(func)
@@ -59,5 +81,5 @@ def callbackrule(after = None):
             depnodes = {k:adageobj.dag.getNode(v) for k,v in after.items()}
             func(depnodes = depnodes, adageobj = adageobj)
 
-        return Rule(predicate,body)
+        return Rule(predicate,body,watches = list(after.values()))
     return decorator
@@ -1,41 +1,669 @@
+import time
+import array
+import functools
 import networkx as nx
 import logging
 
+import adage.nodestate as nodestate
 from .node import Node
 
 log = logging.getLogger(__name__)
-class AdageDAG(nx.DiGraph):
-    def addTask(self,task, nodename = 'node', depends_on = None):
+
+class DAGObserver(object):
+    '''
+    base class for objects that want to be notified about changes of the DAG.
+    register instances via :meth:`AdageDAG.addObserver`
+    '''
+    def node_added(self,nodeobj):
+        pass
+
+    def edge_added(self,fromobj,toobj):
+        pass
+
+    def node_removed(self,nodeobj):
+        '''called right before the node is removed from the DAG'''
+        pass
+
+    def node_submitted(self,nodeobj):
+        '''called after the task of the node was handed to the backend'''
+        pass
+
+    def state_changed(self,nodeobj,oldstate):
+        pass
+
+    def upstream_failure_changed(self,nodeobj):
+        '''called when the upstream failure flag of the node was set or cleared'''
+        pass
+
+    def rules_applied(self,rules):
+        '''called after the rules were applied (and moved to the applied rules)'''
+        pass
+
+class DAGMixin(object):
+    '''
+    the adage workflow graph logic (observers, upstream failure flags, node lookup),
+    shared by the graph stores. Stores provide ``add_node``, ``add_edge``, ``remove_node``,
+    ``nodes``, ``successors``, ``predecessors`` and ``descendants``.
+
+    A topological order of the nodes is maintained incrementally as the graph grows
+    (Pearce-Kelly): new nodes go to the end of the order and an edge that contradicts
+    the order only reorders the nodes between its endpoints.
+
+    Name and state indexes cost memory for every node and are only kept if enabled
+    with ``index_nodes``; otherwise lookups by name or state scan the graph. Tags are
+    always indexed, they only cost memory for tagged nodes.
+    '''
+    index_nodes = False
+
+    def _init_bookkeeping(self,index_nodes = None):
+        self.observers = []
+        self.failed_upstream = set()
+        if index_nodes is not None:
+            self.index_nodes = index_nodes
+
+        # secondary indexes: name, state and tag to node identifiers (dicts used as ordered sets)
+        self.name_index = {}
+        self.state_index = {}
+        self.tag_index = {}
+        self.node_tags = {}
+
+        # topological order: position of each node and the nodes by position (None for removed nodes)
+        self.topo_position = {}
+        self.topo_nodes = []
+
+    def _order_append(self,node):
+        self.topo_position[node] = len(self.topo_nodes)
+        self.topo_nodes.append(node)
+
+    def _order_remove(self,node):
+        self.topo_nodes[self.topo_position.pop(node)] = None
+        if len(self.topo_nodes) > 2*len(self.topo_position):
+            self.topo_nodes = [x for x in self.topo_nodes if x is not None]
+            self.topo_position = {x: i for i,x in enumerate(self.topo_nodes)}
+
+    def _order_edge(self,fromnode,tonode):
+        '''
+        update the topological order for a new edge
+
+        :raises RuntimeError: if the edge would create a cycle
+        '''
+        position = self.topo_position
+        lower, upper = position[tonode], position[fromnode]
+        if upper < lower:
+            return
+        if fromnode == tonode:
+            raise RuntimeError('adding edge {} -> {} would create a cycle'.format(fromnode,tonode))
+        forward, stack = {tonode}, [tonode]
+        while stack:
+            for x in self.successors(stack.pop()):
+                if x == fromnode:
+                    raise RuntimeError('adding edge {} -> {} would create a cycle'.format(fromnode,tonode))
+                if x not in forward and position[x] < upper:
+                    forward.add(x)
+                    stack.append(x)
+        backward, stack = {fromnode}, [fromnode]
+        while stack:
+            for x in self.predecessors(stack.pop()):
+                if x not in backward and lower < position[x]:
+                    backward.add(x)
+                    stack.append(x)
+        nodes = sorted(backward, key = position.get) + sorted(forward, key = position.get)
+        for node, slot in zip(nodes, sorted(position[x] for x in nodes)):
+            position[node] = slot
+            self.topo_nodes[slot] = node
+
+    def _rebuild_order(self):
+        '''
+        recompute the topological order from scratch (e.g. after edges were added in bulk)
+
+        :raises RuntimeError: if the graph contains a cycle
+        '''
+        pending = {node: len(list(self.predecessors(node))) for node in self.nodes()}
+        stack = [node for node, count in pending.items() if not count]
+        self.topo_nodes, self.topo_position = [], {}
+        while stack:
+            node = stack.pop()
+            self._order_append(node)
+            for x in self.successors(node):
+                pending[x] -= 1
+                if not pending[x]:
+                    stack.append(x)
+        if len(self.topo_nodes) != len(pending):
+            raise RuntimeError('graph contains a cycle')
+
+    def _sync_bookkeeping(self):
+        '''
+        rebuild the indexes, the topological order and the upstream failure flags if
+        nodes entered or left the graph bypassing the DAG methods (e.g. through the
+        networkx API, ``copy()`` or construction from existing graph data)
+        '''
+        if len(self.topo_position) == len(self):
+            return
+        nodes = set(self.nodes())
+        self.name_index, self.state_index = {}, {}
+        if self.index_nodes:
+            for node in self.nodes():
+                nodeobj = self.getNode(node)
+                self.name_index.setdefault(nodeobj.name,{})[node] = None
+                self.state_index.setdefault(nodeobj.state,{})[node] = None
+        for node in [x for x in self.node_tags if x not in nodes]:
+            for tag in self.node_tags.pop(node):
+                _discard(self.tag_index,tag,node)
+        self._rebuild_order()
+        self.failed_upstream = set()
+        for node in self.topo_nodes:
+            if any(self._taints_successors(x) for x in self.predecessors(node)):
+                self.failed_upstream.add(node)
+
+    def loadEdges(self,edges):
+        '''
+        add many edges at once while loading a stored graph. The edges are inserted as they
+        are consumed, without checks or notifications, and the topological order and the
+        upstream failure flags are derived once all of them were added.
+
+        :param edges: iterable of (from, to) node identifiers
+        :raises RuntimeError: if the edges contain a cycle
+        '''
+        self.add_edges_from(edges)
+        self._rebuild_order()
+        self._recompute_failure(set(self.nodes()))
+
+    def topologicalSort(self,nodes = None):
+        '''
+        :param nodes: optional collection of node identifiers to restrict the order to
+        :return: list of the node identifiers in topological order
+        '''
+        self._sync_bookkeeping()
+        if nodes is None:
+            return [x for x in self.topo_nodes if x is not None]
+        return sorted(nodes, key = self.topo_position.__getitem__)
+
+    def addObserver(self,observer):
+        self.observers.append(observer)
+
+    def removeObserver(self,observer):
+        self.observers.remove(observer)
+
+    def _notify(self,event,*args):
+        for observer in self.observers:
+            getattr(observer,event)(*args)
+
+    def upstreamFailed(self,nodeobj):
+        '''
+        :param nodeobj: the node object
+        :return: ``True`` if any of the ancestors of the node failed, ``False`` otherwise
+        '''
+        self._sync_bookkeeping()
+        return nodeobj.identifier in self.failed_upstream
+
+    def _taints_successors(self,node):
+        return node in self.failed_upstream or self.getNode(node).state == nodestate.FAILED
+
+    def _propagate_failure(self,nodes):
+        '''
+        flag all descendants of the given nodes as having a failed upstream. The walk
+        stops at nodes already flagged, so it only touches the newly affected subgraph.
+        '''
+        stack = [x for node in nodes for x in self.successors(node)]
+        while stack:
+            node = stack.pop()
+            if node in self.failed_upstream:
+                continue
+            self.failed_upstream.add(node)
+            self._notify('upstream_failure_changed',self.getNode(node))
+            stack.extend(self.successors(node))
+
+    def _recompute_failure(self,descendants):
+        '''
+        re-derive the upstream failure flags of a set of nodes (in case a failure was retracted)
+        '''
+        previous = self.failed_upstream.intersection(descendants)
+        self.failed_upstream.difference_update(descendants)
+        for node in self.topologicalSort(descendants):
+            if any(self._taints_successors(x) for x in self.predecessors(node)):
+                self.failed_upstream.add(node)
+        for node in previous.symmetric_difference(self.failed_upstream.intersection(descendants)):
+            self._notify('upstream_failure_changed',self.getNode(node))
+
+    def addTask(self,task, nodename = 'node', depends_on = None, tags = None):
         '''
         add a node based on a task to the DAG
         :param: task: the task object
         :param: nodename: name of the node
         :param: depends_on: list of node objects to be declared as dependencies
+        :param: tags: optional list of tags to look up the node by (c.f. :meth:`getNodesByTag`)
         :return: the newly created node object
         '''
         node = Node(nodename,task)
-        self.addNode(node,depends_on)
+        self.addNode(node,depends_on,tags)
         return node
 
-    def addNode(self,nodeobj,depends_on = None):
-        self.add_node(nodeobj.identifier, nodeobj=nodeobj)
-        for parent in (depends_on or []):
-            self.addEdge(parent,nodeobj)
+    def addTasks(self,tasks,tags = None):
+        '''
+        add many nodes based on tasks to the DAG at once
+
+        :param: tasks: iterable of (task, nodename, depends_on) tuples, c.f. :meth:`addTask`
+        :param: tags: optional list of tags for all the new nodes
+        :return: list of the newly created node objects
+        '''
+        tasks = list(tasks)
+        define_time = time.time()
+        nodeobjs = [Node(nodename,task,define_time = define_time) for task, nodename, _ in tasks]
+        self._sync_bookkeeping()
+        self._add_nodes(nodeobjs,tags)
+        # the nodes are new: their edges can not exist yet and agree with the order
+        edges = [(parent,nodeobj) for nodeobj, (_, _, depends_on) in zip(nodeobjs,tasks)
+                 for parent in {x.identifier: x for x in depends_on or ()}.values()]
+        self.add_edges_from([(fromobj.identifier, toobj.identifier) for fromobj, toobj in edges])
+        self._edges_added(edges)
+        return nodeobjs
+
+    def scatter(self,func,parameters,nodename = 'node',depends_on = None,tags = None):
+        '''
+        add one node per parameter set, all running the same function
+
+        :param: func: the task function
+        :param: parameters: iterable of dictionaries of keyword arguments to call the function with
+        :param: nodename: name of the nodes
+        :param: depends_on: list of node objects all new nodes depend on
+        :param: tags: optional list of tags for all the new nodes
+        :return: list of the newly created node objects
+        '''
+        return self.addTasks([(functools.partial(func,**kwargs), nodename, depends_on) for kwargs in parameters], tags)
+
+    def addNode(self,nodeobj,depends_on = None,tags = None):
+        self.addNodes([nodeobj],tags)
+        self.addEdges([(parent,nodeobj) for parent in (depends_on or [])])
+
+    def addNodes(self,nodeobjs,tags = None):
+        '''
+        add many node objects to the DAG at once
+
+        :param: nodeobjs: list of node objects
+        :param: tags: optional list of tags for all the nodes
+        '''
+        self._sync_bookkeeping()
+        self._add_nodes(nodeobjs,tags)
+
+    def _add_nodes(self,nodeobjs,tags = None):
+        self.add_nodes_from([(nodeobj.identifier, {'nodeobj': nodeobj}) for nodeobj in nodeobjs])
+        position = self.topo_position
+        new = [nodeobj.identifier for nodeobj in nodeobjs if nodeobj.identifier not in position]
+        position.update(zip(new, range(len(self.topo_nodes), len(self.topo_nodes)+len(new))))
+        self.topo_nodes.extend(new)
+        if self.index_nodes:
+            name_index, state_index = self.name_index, self.state_index
+            for nodeobj in nodeobjs:
+                name_index.setdefault(nodeobj.name,{})[nodeobj.identifier] = None
+                state_index.setdefault(nodeobj.state,{})[nodeobj.identifier] = None
+        if tags:
+            for nodeobj in nodeobjs:
+                self.tagNode(nodeobj,tags)
+        if self.observers:
+            for nodeobj in nodeobjs:
+                self._notify('node_added',nodeobj)
 
     def removeNode(self,nodeobj):
+        self._sync_bookkeeping()
+        self._notify('node_removed',nodeobj)
+        descendants = self.descendants(nodeobj.identifier)
         self.remove_node(nodeobj.identifier)
+        self._order_remove(nodeobj.identifier)
+        self.failed_upstream.discard(nodeobj.identifier)
+        _discard(self.name_index,nodeobj.name,nodeobj.identifier)
+        _discard(self.state_index,nodeobj.state,nodeobj.identifier)
+        for tag in self.node_tags.pop(nodeobj.identifier,()):
+            _discard(self.tag_index,tag,nodeobj.identifier)
+        self._recompute_failure(descendants)
 
     def addEdge(self,fromobj,toobj):
-        self.add_edge(fromobj.identifier,toobj.identifier)
+        '''
+        :raises RuntimeError: if the edge would create a cycle
+        '''
+        self.addEdges([(fromobj,toobj)])
 
-    def getNode(self,ident):
-        return self.nodes[ident]['nodeobj']
+    def addEdges(self,edges):
+        '''
+        add many edges to the DAG at once. If all edges agree with the current topological
+        order (e.g. edges from existing nodes to new ones), they are inserted in bulk.
+
+        :param: edges: list of (from, to) node object pairs. Edges that already exist are skipped.
+        :raises RuntimeError: if an edge would create a cycle. The graph is left unchanged in that case.
+        '''
+        self._sync_bookkeeping()
+        position = self.topo_position
+        new, seen = [], set()
+        for fromobj, toobj in edges:
+            pair = (fromobj.identifier, toobj.identifier)
+            if pair not in seen and not self.has_edge(*pair):
+                seen.add(pair)
+                new.append((fromobj, toobj))
+        edges = new
+        pairs = [(fromobj.identifier, toobj.identifier) for fromobj, toobj in edges]
+        if all(position[fromnode] < position[tonode] for fromnode, tonode in pairs):
+            self.add_edges_from(pairs)
+        else:
+            inserted = []
+            try:
+                for fromnode, tonode in pairs:
+                    self._order_edge(fromnode,tonode)
+                    self.add_edge(fromnode,tonode)
+                    inserted.append((fromnode,tonode))
+            except RuntimeError:
+                # the order stays valid for the graph without the inserted edges
+                for fromnode, tonode in inserted:
+                    self.remove_edge(fromnode,tonode)
+                raise
+        self._edges_added(edges)
+
+    def _edges_added(self,edges):
+        '''
+        derive the upstream failure flags for newly inserted edges and announce them
+        '''
+        sources = set(fromobj.identifier for fromobj, _ in edges)
+        tainting = set(x for x in sources if self._taints_successors(x))
+        for fromobj, toobj in (edges if tainting else ()):
+            if fromobj.identifier in tainting and toobj.identifier not in self.failed_upstream:
+                self.failed_upstream.add(toobj.identifier)
+                self._notify('upstream_failure_changed',toobj)
+                self._propagate_failure([toobj.identifier])
+        if self.observers:
+            for fromobj, toobj in edges:
+                self._notify('edge_added',fromobj,toobj)
+
+    def stateChanged(self,nodeobj,oldstate):
+        '''
+        announce a state transition of a node to the observers of the DAG
+
+        :param nodeobj: the node object whose state changed
+        :param oldstate: the state of the node before the transition
+        '''
+        if self.index_nodes:
+            _discard(self.state_index,oldstate,nodeobj.identifier)
+            self.state_index.setdefault(nodeobj.state,{})[nodeobj.identifier] = None
+        if nodeobj.state == nodestate.FAILED and oldstate != nodestate.FAILED:
+            self._propagate_failure([nodeobj.identifier])
+        elif oldstate == nodestate.FAILED and nodeobj.state != nodestate.FAILED:
+            self._recompute_failure(self.descendants(nodeobj.identifier))
+        self._notify('state_changed',nodeobj,oldstate)
+
+    def nodesSubmitted(self,nodeobjs):
+        '''
+        announce to the observers of the DAG that nodes were submitted
+
+        :param nodeobjs: the node objects whose tasks were handed to the backend
+        '''
+        for nodeobj in nodeobjs:
+            self._notify('node_submitted',nodeobj)
+
+    def rulesApplied(self,rules):
+        '''
+        announce to the observers of the DAG that rules were applied to the workflow
+
+        :param rules: the applied rules
+        '''
+        self._notify('rules_applied',rules)
+
+    def tagNode(self,nodeobj,tags):
+        '''
+        :param nodeobj: the node object
+        :param tags: list of tags to add to the node
+        '''
+        nodetags = self.node_tags.setdefault(nodeobj.identifier,set())
+        for tag in tags:
+            nodetags.add(tag)
+            self.tag_index.setdefault(tag,{})[nodeobj.identifier] = None
+
+    def getNodesByName(self,name):
+        '''
+        :return: list of the node objects with the given name (in time proportional to
+            the result if ``index_nodes`` is enabled)
+        '''
+        self._sync_bookkeeping()
+        if not self.index_nodes:
+            return [x for x in map(self.getNode,self.nodes()) if x.name == name]
+        return [self.getNode(x) for x in self.name_index.get(name,())]
+
+    def getNodesByState(self,state):
+        '''
+        :param state: the node state (e.g. ``nodestate.RUNNING``)
+        :return: list of the node objects in that state (in time proportional to the
+            result if ``index_nodes`` is enabled)
+        '''
+        self._sync_bookkeeping()
+        if not self.index_nodes:
+            return [x for x in map(self.getNode,self.nodes()) if x.state == state]
+        return [self.getNode(x) for x in self.state_index.get(state,())]
+
+    def getNodesByTag(self,tag):
+        '''
+        :return: list of the node objects with the given tag
+        '''
+        self._sync_bookkeeping()
+        return [self.getNode(x) for x in self.tag_index.get(tag,())]
 
     def getNodeByName(self,name, nodefilter = None):
         nodefilter = nodefilter or (lambda x: True)
-        matching = [x for x in self.nodes() if self.getNode(x).name == name and nodefilter(self.getNode(x))]
+        matching = [x for x in self.getNodesByName(name) if nodefilter(x)]
         if len(matching) > 1:
             log.error('requested name %s',name)
-            log.error('matching nodes %s',[self.getNode(x) for x in matching])
+            log.error('matching nodes %s',matching)
             raise RuntimeError("getting node by name resulted in multiple matching nodes, try getting by ID")
-        return self.getNode(matching[0]) if matching else None
+        return matching[0] if matching else None
+
+def _discard(index,key,node):
+    entries = index.get(key)
+    if entries is None:
+        return
+    entries.pop(node,None)
+    if not entries:
+        del index[key]
+
+class AdageDAG(DAGMixin,nx.DiGraph):
+    '''
+    workflow graph stored in a networkx directed graph
+    '''
+    def __init__(self, incoming_graph_data = None, index_nodes = None, **attr):
+        '''
+        :param index_nodes: keep indexes of the nodes by name and state (c.f. :class:`DAGMixin`)
+        '''
+        self._init_bookkeeping(index_nodes)
+        super(AdageDAG,self).__init__(incoming_graph_data, **attr)
+        if incoming_graph_data is not None:
+            self._sync_bookkeeping()
+
+    def copy(self, as_view = False):
+        graph = super(AdageDAG,self).copy(as_view)
+        if not as_view:
+            graph.index_nodes = self.index_nodes
+            for node, tags in self.node_tags.items():
+                graph.tagNode(self.getNode(node),tags)
+        return graph
+
+    def descendants(self,node):
+        return nx.descendants(self,node)
+
+    def getNode(self,ident):
+        return self.nodes[ident]['nodeobj']
+
+    def to_networkx(self):
+        return self
+
+class ArrayDAG(DAGMixin):
+    '''
+    memory-lean workflow graph for very large workflows. Nodes are numbered by
+    integer indices and the edges are kept in flat integer arrays (forward-star
+    representation): for every node the index of its first outgoing and incoming
+    edge, for every edge its endpoints and the next edge of the same node. Edges of
+    removed nodes are marked as dead rather than unlinked.
+    '''
+    def __init__(self,index_nodes = None):
+        '''
+        :param index_nodes: keep indexes of the nodes by name and state (c.f. :class:`DAGMixin`)
+        '''
+        self._init_bookkeeping(index_nodes)
+        self._index = {}
+        self._identifiers = []
+        self._nodeobjs = []
+        self._firstout = array.array('q')
+        self._firstin = array.array('q')
+        self._indegree = array.array('q')
+        self._outdegree = array.array('q')
+        self._source = array.array('q')
+        self._target = array.array('q')
+        self._nextout = array.array('q')
+        self._nextin = array.array('q')
+        self._nedges = 0
+
+    def add_node(self,node,nodeobj = None):
+        if node in self._index:
+            self._nodeobjs[self._index[node]] = nodeobj
+            return
+        self._index[node] = len(self._identifiers)
+        self._identifiers.append(node)
+        self._nodeobjs.append(nodeobj)
+        for arr in (self._firstout, self._firstin):
+            arr.append(-1)
+        for arr in (self._indegree, self._outdegree):
+            arr.append(0)
+
+    def _add_edge(self,source,target):
+        edge = len(self._source)
+        self._source.append(source)
+        self._target.append(target)
+        self._nextout.append(self._firstout[source])
+        self._nextin.append(self._firstin[target])
+        self._firstout[source] = edge
+        self._firstin[target] = edge
+        self._outdegree[source] += 1
+        self._indegree[target] += 1
+        self._nedges += 1
+
+    def add_nodes_from(self,nodes):
+        for node, attr in nodes:
+            self.add_node(node, attr['nodeobj'])
+
+    def has_edge(self,fromnode,tonode):
+        source, target = self._index[fromnode], self._index[tonode]
+        # look for the edge on the side with fewer edges
+        if self._outdegree[source] <= self._indegree[target]:
+            return target in self._out(source)
+        return source in self._in(target)
+
+    def add_edge(self,fromnode,tonode):
+        if not self.has_edge(fromnode,tonode):
+            self._add_edge(self._index[fromnode], self._index[tonode])
+
+    def add_edges_from(self,edges):
+        for fromnode, tonode in edges:
+            self.add_edge(fromnode, tonode)
+
+    def remove_edge(self,fromnode,tonode):
+        source, target = self._index[fromnode], self._index[tonode]
+        for edge in self._outedges(source):
+            if self._target[edge] == target:
+                self._source[edge] = self._target[edge] = -1
+                self._outdegree[source] -= 1
+                self._indegree[target] -= 1
+                self._nedges -= 1
+                return
+
+    def remove_node(self,node):
+        index = self._index.pop(node)
+        for edge in list(self._outedges(index)) + list(self._inedges(index)):
+            self._outdegree[self._source[edge]] -= 1
+            self._indegree[self._target[edge]] -= 1
+            self._source[edge] = self._target[edge] = -1
+            self._nedges -= 1
+        self._identifiers[index] = None
+        self._nodeobjs[index] = None
+
+    def _outedges(self,index):
+        edge = self._firstout[index]
+        while edge != -1:
+            if self._target[edge] != -1:
+                yield edge
+            edge = self._nextout[edge]
+
+    def _inedges(self,index):
+        edge = self._firstin[index]
+        while edge != -1:
+            if self._source[edge] != -1:
+                yield edge
+            edge = self._nextin[edge]
+
+    def _out(self,index):
+        targets, nextout = self._target, self._nextout
+        result, edge = [], self._firstout[index]
+        while edge != -1:
+            if targets[edge] != -1:
+                result.append(targets[edge])
+            edge = nextout[edge]
+        return result
+
+    def _in(self,index):
+        sources, nextin = self._source, self._nextin
+        result, edge = [], self._firstin[index]
+        while edge != -1:
+            if sources[edge] != -1:
+                result.append(sources[edge])
+            edge = nextin[edge]
+        return result
+
+    def getNode(self,ident):
+        return self._nodeobjs[self._index[ident]]
+
+    def nodes(self):
+        return list(self._index)
+
+    def edges(self):
+        return [(self._identifiers[s], self._identifiers[t]) for s, t in zip(self._source, self._target) if s != -1]
+
+    def successors(self,node):
+        identifiers = self._identifiers
+        return [identifiers[x] for x in self._out(self._index[node])]
+
+    def predecessors(self,node):
+        identifiers = self._identifiers
+        return [identifiers[x] for x in self._in(self._index[node])]
+
+    def in_degree(self,node):
+        return self._indegree[self._index[node]]
+
+    def out_degree(self,node):
+        return self._outdegree[self._index[node]]
+
+    def number_of_nodes(self):
+        return len(self._index)
+
+    def number_of_edges(self):
+        return self._nedges
+
+    def __len__(self):
+        return len(self._index)
+
+    def __iter__(self):
+        return iter(list(self._index))
+
+    def __contains__(self,node):
+        return node in self._index
+
+    def descendants(self,node):
+        seen = set()
+        stack = self._out(self._index[node])
+        while stack:
+            index = stack.pop()
+            if index not in seen:
+                seen.add(index)
+                stack.extend(self._out(index))
+        return set(self._identifiers[x] for x in seen)
+
+    def to_networkx(self):
+        '''
+        :return: a networkx copy of the graph (e.g. for visualization), with the node
+            objects stored in the ``nodeobj`` node attribute
+        '''
+        graph = nx.DiGraph()
+        graph.add_nodes_from((node, {'nodeobj': self.getNode(node)}) for node in self._index)
+        graph.add_edges_from(self.edges())
+        return graph
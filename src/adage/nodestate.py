@@ -1,12 +1,20 @@
 class NodeState(object):
-    def __init__(self,name):
+    '''
+    a node state. Nodes store the small integer ``code`` of their state, which is
+    also the index of the state in :data:`STATES`. The terminal states have the
+    highest codes.
+    '''
+    def __init__(self,name,code):
         self.name = name
+        self.code = code
     def __repr__(self):
         return '<NodeState: {}>'.format(self.name)
     def __str__(self):
         return self.name
-    
-DEFINED     = NodeState('DEFINED')
-RUNNING     = NodeState('RUNNING')
-FAILED      = NodeState('FAILED')
-SUCCESS     = NodeState('SUCCESS')
\ No newline at end of file
+
+DEFINED     = NodeState('DEFINED', 0)
+RUNNING     = NodeState('RUNNING', 1)
+FAILED      = NodeState('FAILED', 2)
+SUCCESS     = NodeState('SUCCESS', 3)
+
+STATES = [DEFINED, RUNNING, FAILED, SUCCESS]
@@ -0,0 +1,179 @@
+import logging
+
+import adage.nodestate as nodestate
+from adage.graph import DAGObserver
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+log = logging.getLogger(__name__)
+
+#state code of nodes that are not (yet) defined at a given time or were removed
+UNDEFINED = -1
+
+class NodeTable(DAGObserver):
+    '''
+    structure-of-arrays table of the timestamps and state codes of all nodes of a DAG,
+    for vectorized queries such as the states of all nodes at a given time, queue wait
+    times, runtimes or the number of running tasks over time. Missing timestamps are NaN.
+
+    Nodes changed since the last query are marked and their rows are refreshed
+    from the node objects right before the next query. Requires numpy.
+    '''
+    def __init__(self,dag,capacity = 1024):
+        if np is None:
+            raise RuntimeError('the node table requires numpy (pip install adage[analytics])')
+        self.dag = dag
+        self.rows = {}
+        self.identifiers = []
+        self.size = 0
+        self._define_time = np.full(capacity, np.nan)
+        self._submit_time = np.full(capacity, np.nan)
+        self._ready_by_time = np.full(capacity, np.nan)
+        self._state = np.full(capacity, UNDEFINED, dtype = np.int8)
+        self._dirty = {}
+        for node in dag.topologicalSort():
+            self.node_added(dag.getNode(node))
+        dag.addObserver(self)
+
+    def detach(self):
+        self.dag.removeObserver(self)
+
+    def _grow(self):
+        capacity = 2*len(self._state)
+        for name in ['_define_time', '_submit_time', '_ready_by_time']:
+            column = np.full(capacity, np.nan)
+            column[:self.size] = getattr(self,name)[:self.size]
+            setattr(self,name,column)
+        state = np.full(capacity, UNDEFINED, dtype = np.int8)
+        state[:self.size] = self._state[:self.size]
+        self._state = state
+
+    def _refresh(self):
+        for identifier, nodeobj in self._dirty.items():
+            row = self.rows.get(identifier)
+            if row is None:
+                continue
+            self._define_time[row] = nodeobj.define_time if nodeobj.define_time is not None else np.nan
+            self._submit_time[row] = nodeobj.submit_time if nodeobj.submit_time is not None else np.nan
+            self._ready_by_time[row] = nodeobj.ready_by_time if nodeobj.ready_by_time is not None else np.nan
+            self._state[row] = nodeobj.state.code
+        self._dirty = {}
+
+    def _column(self,name):
+        self._refresh()
+        return getattr(self,name)[:self.size]
+
+    @property
+    def define_time(self):
+        return self._column('_define_time')
+
+    @property
+    def submit_time(self):
+        return self._column('_submit_time')
+
+    @property
+    def ready_by_time(self):
+        return self._column('_ready_by_time')
+
+    @property
+    def state(self):
+        return self._column('_state')
+
+    def node_added(self,nodeobj):
+        if self.size == len(self._state):
+            self._grow()
+        self.rows[nodeobj.identifier] = self.size
+        self.identifiers.append(nodeobj.identifier)
+        self.size += 1
+        self._dirty[nodeobj.identifier] = nodeobj
+
+    def node_removed(self,nodeobj):
+        self._refresh()
+        row = self.rows.pop(nodeobj.identifier)
+        self.identifiers[row] = None
+        self._define_time[row] = self._submit_time[row] = self._ready_by_time[row] = np.nan
+        self._state[row] = UNDEFINED
+
+    def node_submitted(self,nodeobj):
+        self._dirty[nodeobj.identifier] = nodeobj
+
+    def state_changed(self,nodeobj,oldstate):
+        self._dirty[nodeobj.identifier] = nodeobj
+
+    def states_at(self,time):
+        '''
+        :param time: the point in time
+        :return: array of the state codes of all rows at that time (c.f. :func:`adage.visualize.state_at_time`),
+            ``UNDEFINED`` for nodes not yet defined at that time
+        '''
+        define, submit, ready, state = self.define_time, self.submit_time, self.ready_by_time, self.state
+        codes = np.full(self.size, nodestate.DEFINED.code, dtype = np.int8)
+        codes[(submit <= time) & (time < ready)] = nodestate.RUNNING.code
+        done = ready <= time
+        codes[done] = state[done]
+        codes[~(define <= time)] = UNDEFINED
+        return codes
+
+    def node_states_at(self,time):
+        '''
+        :return: dictionary of the node identifiers and their states (None if not yet defined) at a point in time
+        '''
+        return {identifier: (nodestate.STATES[code] if code != UNDEFINED else None)
+                for identifier, code in zip(self.identifiers, self.states_at(time).tolist()) if identifier is not None}
+
+    def counts(self,time = None):
+        '''
+        :param time: point in time (default: the current states)
+        :return: dictionary of the number of nodes per state
+        '''
+        codes = self.state if time is None else self.states_at(time)
+        histogram = np.bincount(codes[codes != UNDEFINED], minlength = len(nodestate.STATES))
+        return {state: int(histogram[state.code]) for state in nodestate.STATES}
+
+    def queue_waits(self):
+        '''
+        :return: array of the times between definition and submission of the submitted nodes
+        '''
+        waits = self.submit_time - self.define_time
+        return waits[~np.isnan(waits)]
+
+    def runtimes(self):
+        '''
+        :return: array of the times between submission and readiness of the finished nodes
+        '''
+        runtimes = self.ready_by_time - self.submit_time
+        return runtimes[~np.isnan(runtimes)]
+
+    def running_at(self,times):
+        '''
+        :param times: array of points in time
+        :return: array of the number of nodes running at each of the times (i.e. the utilization)
+        '''
+        submit, ready = self.submit_time, self.ready_by_time
+        submitted = ~np.isnan(submit)
+        starts = np.sort(submit[submitted])
+        ends = np.sort(np.where(np.isnan(ready[submitted]), np.inf, ready[submitted]))
+        times = np.asarray(times)
+        return np.searchsorted(starts, times, side = 'right') - np.searchsorted(ends, times, side = 'right')
+
+    def time_range(self):
+        '''
+        :return: tuple of the earliest definition time and the latest time a node became ready
+        '''
+        define, ready = self.define_time, self.ready_by_time
+        start = np.nanmin(define) if np.any(~np.isnan(define)) else None
+        stop = np.nanmax(ready) if np.any(~np.isnan(ready)) else None
+        return start, stop
+
+def node_table(dag):
+    '''
+    :return: a (detached) node table of the DAG, None if numpy is not available
+    '''
+    if np is None:
+        return None
+    table = NodeTable(dag)
+    table.detach()
+    return table
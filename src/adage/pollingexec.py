@@ -8,41 +8,30 @@ def advance_coroutine(coroutine):
     except AttributeError:
         return coroutine.__next__()
 
-def update_coroutine(controller):
-    '''
-    loops over applicable coroutines, applies them and manages the bookkeeping (moving rules from 'open' to 'applied')
-    :param controller: the adage workflow controller
-    '''
-
-    for rule in controller.applicable_rules():
-        do_apply = yield rule
-        if do_apply:
-            log.debug('extending graph.')
-            controller.apply_rules([rule])
-        yield
-
 def update_dag(controller, decider, recurse):
     '''
     :param controller: the adage workflow controller
     :param decider: a decision coroutine.
 
-    Higher level DAG update routine that calls the basic update loop recursively (
-    in order to apply as many DAG extensions as possible). The `decider` coroutine will
+    Higher level DAG update routine that offers the applicable rules to the decider and
+    applies the accepted ones as a batch. It recurses (in order to apply as many DAG
+    extensions as possible) as long as rules were applied. The `decider` coroutine will
     receive a (rule, controller) tuple and is expected to return control by yielding
     a boolean value
     '''
     log.debug("update DAG by submitting nodes")
-    anyapplied = False
-    update_loop = update_coroutine(controller)
-    for possible_rule in update_loop:
+    rules = []
+    for possible_rule in controller.applicable_rules():
         log.debug('we could update this with rule: %s',possible_rule)
         command = decider.send((possible_rule,controller))
         if command:
             log.debug('we are in fact updating this..')
-            anyapplied = True
-        update_loop.send(command)
+            rules.append(possible_rule)
+    if rules:
+        log.debug('extending graph.')
+        controller.apply_rules(rules)
     #we changed the state so let's just recurse
-    if anyapplied and recurse:
+    if rules and recurse:
         log.debug('we applied a change, so we will recurse to see if we can apply anything else give updated state')
         controller.sync_backend() #so that we are up to date
         update_dag(controller, decider, recurse)
@@ -110,24 +99,16 @@ def standard_stop_decider():
     while True:
         log.debug('deciding if to finish: %s',data)
         #we yield True and wait again to receive some data
-        success = data.successful()
         value   = data.finished()
+        success = value and data.successful()
         data = yield (value, success)
 
-def setup_polling_execution(
-    extend_decider = None,
-    submit_decider = None,
-    finish_decider = None,
-    recursive_updates = True):
+def setup_deciders(extend_decider = None, submit_decider = None, finish_decider = None):
     '''
-    sets up the main couroutine and auxiliary decision coroutines for polling-style
-    workflow exectuion. Optionally decision coroutines can be passed as parameters
-    (must already be primed)
+    fills in (and primes) the default decision coroutines for the deciders that are not given
 
-    :param extend_decider: decision coroutine to decide whether to apply applicable rules
-    :param submit_decider: decision coroutine to decide whether to submit applicable nodes
+    :return: tuple of extend, submit and finish deciders
     '''
-
     if not extend_decider:
         extend_decider = yes_man('say yes to graph extension by %s')
         advance_coroutine(extend_decider) # prime
@@ -140,6 +121,24 @@ def setup_polling_execution(
         finish_decider = standard_stop_decider()
         advance_coroutine(finish_decider) # prime
 
+    return extend_decider, submit_decider, finish_decider
+
+def setup_polling_execution(
+    extend_decider = None,
+    submit_decider = None,
+    finish_decider = None,
+    recursive_updates = True):
+    '''
+    sets up the main couroutine and auxiliary decision coroutines for polling-style
+    workflow exectuion. Optionally decision coroutines can be passed as parameters
+    (must already be primed)
+
+    :param extend_decider: decision coroutine to decide whether to apply applicable rules
+    :param submit_decider: decision coroutine to decide whether to submit applicable nodes
+    '''
+
+    extend_decider, submit_decider, finish_decider = setup_deciders(extend_decider, submit_decider, finish_decider)
+
     ## prep main coroutine with deciders..
     log.info('preparing adage coroutine.')
     coroutine = adage_coroutine(extend_decider, submit_decider, finish_decider, recursive_updates)
@@ -0,0 +1,96 @@
+import logging
+
+import adage.nodestate as nodestate
+from adage.graph import DAGObserver
+
+log = logging.getLogger(__name__)
+
+class ReadyQueue(DAGObserver):
+    '''
+    event-driven bookkeeping of the submittable nodes of a DAG
+
+    for every node we keep the number of predecessors that did not (yet) finish
+    successfully. The counts are updated whenever the DAG is extended or a node
+    changes its state, so that the nodes whose upstream is complete can be handed
+    out without scanning the full graph.
+    '''
+    def __init__(self,dag):
+        self.dag = dag
+        self.pending = {}
+        self.ready = {}
+        self.unannounced = {}
+        for node in dag.nodes():
+            nodeobj = dag.getNode(node)
+            self.pending[node] = sum(1 for x in dag.predecessors(node) if not dag.getNode(x).successful())
+            self._check_ready(nodeobj)
+        dag.addObserver(self)
+
+    def detach(self):
+        self.dag.removeObserver(self)
+
+    def _check_ready(self,nodeobj):
+        if self.pending[nodeobj.identifier] == 0 and not nodeobj.submit_time:
+            self.ready[nodeobj.identifier] = nodeobj
+
+    def submittable(self):
+        '''
+        :return: generator of the nodes with successful upstream that were not yet submitted
+        '''
+        for node, nodeobj in list(self.ready.items()):
+            if nodeobj.submit_time:
+                # submitted without going through the DAG's nodesSubmitted announcement
+                log.debug("node %s already submitted. dropping it from ready queue", nodeobj)
+                del self.ready[node]
+                self.unannounced[node] = nodeobj
+                continue
+            yield nodeobj
+
+    def take_unannounced(self):
+        '''
+        :return: the nodes found submitted although their submission was not announced
+            to the DAG (e.g. submitted directly with :func:`adage.controllerutils.submit_nodes`),
+            each of them only once
+        '''
+        for node, nodeobj in list(self.ready.items()):
+            if nodeobj.submit_time:
+                del self.ready[node]
+                self.unannounced[node] = nodeobj
+        unannounced, self.unannounced = list(self.unannounced.values()), {}
+        return unannounced
+
+    def node_submitted(self,nodeobj):
+        self.ready.pop(nodeobj.identifier, None)
+
+    def node_added(self,nodeobj):
+        self.pending[nodeobj.identifier] = 0
+        self._check_ready(nodeobj)
+
+    def edge_added(self,fromobj,toobj):
+        if fromobj.successful():
+            return
+        self.pending[toobj.identifier] += 1
+        self.ready.pop(toobj.identifier, None)
+
+    def node_removed(self,nodeobj):
+        self.pending.pop(nodeobj.identifier, None)
+        self.ready.pop(nodeobj.identifier, None)
+        self.unannounced.pop(nodeobj.identifier, None)
+        if nodeobj.successful():
+            return
+        for x in self.dag.successors(nodeobj.identifier):
+            self.pending[x] -= 1
+            self._check_ready(self.dag.getNode(x))
+
+    def state_changed(self,nodeobj,oldstate):
+        if not nodeobj.submit_time:
+            # the node was withdrawn from the backend without being run
+            self._check_ready(nodeobj)
+        delta = int(oldstate == nodestate.SUCCESS) - int(nodeobj.successful())
+        if not delta:
+            return
+        for x in self.dag.successors(nodeobj.identifier):
+            self.pending[x] += delta
+            if delta < 0:
+                self._check_ready(self.dag.getNode(x))
+            else:
+                self.ready.pop(x, None)
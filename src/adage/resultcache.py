@@ -0,0 +1,244 @@
+import os
+import pickle
+import logging
+import tempfile
+import collections
+
+import adage.nodestate as nodestate
+from adage.backends import proxy_status
+from adage.taskkeys import task_key
+
+log = logging.getLogger(__name__)
+
+class ResultCache(object):
+    '''
+    persistent on-disk store of task results keyed by the task content hash. Every
+    entry is a pickle file, whose modification time records the last use, so that
+    the least recently used entries can be evicted once the cache exceeds its byte budget.
+    The directory is scanned once on creation; afterwards the sizes and the order of use
+    of the entries are kept in memory.
+    '''
+    suffix = '.pickle'
+
+    def __init__(self,directory,max_bytes = None,salt = ''):
+        '''
+        :param directory: cache directory (created if it does not exist)
+        :param max_bytes: maximum total size of the cached results in bytes (default: unlimited)
+        :param salt: version string mixed into the task keys. Changing it invalidates all entries.
+        '''
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.salt = salt
+        if not os.path.exists(directory):
+            os.makedirs(directory)
+        self.index = collections.OrderedDict()
+        self.total = 0
+        for _, size, path in self._scan():
+            self.index[os.path.basename(path)[:-len(self.suffix)]] = size
+            self.total += size
+
+    def key(self,task):
+        return task_key(task,self.salt)
+
+    def _path(self,key):
+        return os.path.join(self.directory,key+self.suffix)
+
+    def get(self,key):
+        '''
+        :param key: the task key
+        :return: tuple (found, result)
+        '''
+        path = self._path(key)
+        try:
+            with open(path,'rb') as f:
+                result = pickle.load(f)
+        except (IOError, OSError):
+            self._forget(key)
+            return False, None
+        except Exception:
+            log.warning('dropping unreadable cache entry %s', path)
+            self.discard(key)
+            return False, None
+        os.utime(path, None)
+        if key not in self.index:
+            self.index[key] = os.path.getsize(path)
+            self.total += self.index[key]
+        self.index.move_to_end(key)
+        return True, result
+
+    def put(self,key,result):
+        '''
+        store a result and evict least recently used entries beyond the byte budget
+
+        :return: True if the result was stored
+        '''
+        try:
+            data = pickle.dumps(result)
+        except Exception:
+            log.debug('result of task %s can not be pickled, not caching it', key)
+            return False
+        if self.max_bytes is not None and len(data) > self.max_bytes:
+            return False
+        fd, tmppath = tempfile.mkstemp(dir = self.directory)
+        with os.fdopen(fd,'wb') as f:
+            f.write(data)
+        os.replace(tmppath, self._path(key))
+        self._forget(key)
+        self.index[key] = len(data)
+        self.total += len(data)
+        self.evict()
+        return True
+
+    def _forget(self,key):
+        self.total -= self.index.pop(key, 0)
+
+    def discard(self,key):
+        self._forget(key)
+        try:
+            os.remove(self._path(key))
+        except OSError:
+            pass
+
+    def _scan(self):
+        '''
+        :return: list of (last use, size, path) of all entries on disk, least recently used first
+        '''
+        entries = []
+        for filename in os.listdir(self.directory):
+            if not filename.endswith(self.suffix):
+                continue
+            path = os.path.join(self.directory,filename)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        return sorted(entries)
+
+    def size(self):
+        return self.total
+
+    def evict(self):
+        '''
+        remove least recently used entries until the cache fits into the byte budget
+        '''
+        if self.max_bytes is None:
+            return
+        while self.total > self.max_bytes and self.index:
+            key = next(iter(self.index))
+            log.debug('evicting cache entry %s', key)
+            self.discard(key)
+
+class CachedResultProxy(object):
+    '''
+    result proxy of a task whose result was found in the cache
+    '''
+    def __init__(self,result):
+        self.result = result
+
+class CacheMissProxy(object):
+    '''
+    result proxy of a task that was submitted to the wrapped backend, remembering
+    the key under which to store its result once it succeeded
+    '''
+    def __init__(self,proxy,key):
+        self.proxy = proxy
+        self.key = key
+        self.stored = key is None
+        self.fetched = False
+        self.result = None
+
+class CachingBackend(object):
+    '''
+    wraps any backend to reuse the results of identical tasks across workflow runs.
+    Tasks with a cached result are not submitted but immediately reported as successful,
+    new successful results are stored once their success is observed. Other attributes
+    (e.g. ``capacity`` or ``completions``) are those of the wrapped backend.
+    '''
+    def __init__(self,backend,cache):
+        '''
+        :param backend: the task execution backend to wrap
+        :param cache: a :class:`ResultCache`
+        '''
+        self.backend = backend
+        self.cache = cache
+        self.stats = {'hits': 0, 'misses': 0}
+
+    def __getattr__(self,name):
+        if name == 'backend':
+            raise AttributeError(name)
+        return getattr(self.backend,name)
+
+    def _lookup(self,task):
+        key = self.cache.key(task)
+        if key is not None:
+            found, result = self.cache.get(key)
+            if found:
+                self.stats['hits'] += 1
+                return key, CachedResultProxy(result)
+        self.stats['misses'] += 1
+        return key, None
+
+    def _announce(self):
+        completions = getattr(self.backend,'completions',None)
+        if completions is not None:
+            completions.notify()
+
+    def submit(self,task):
+        key, cached = self._lookup(task)
+        if cached:
+            self._announce()
+            return cached
+        return CacheMissProxy(self.backend.submit(task), key)
+
+    def submit_many(self,tasks):
+        lookups = [self._lookup(task) for task in tasks]
+        missing = [task for task, (_, cached) in zip(tasks, lookups) if not cached]
+        if missing and hasattr(self.backend,'submit_many'):
+            submitted = iter(self.backend.submit_many(missing))
+        else:
+            submitted = iter([self.backend.submit(task) for task in missing])
+        if len(missing) < len(tasks):
+            self._announce()
+        return [cached or CacheMissProxy(next(submitted), key) for key, cached in lookups]
+
+    def _store(self,resultproxy):
+        if not resultproxy.stored:
+            resultproxy.stored = True
+            self.cache.put(resultproxy.key, self.result(resultproxy))
+
+    def result(self,resultproxy):
+        if isinstance(resultproxy,CachedResultProxy):
+            return resultproxy.result
+        if not resultproxy.fetched:
+            resultproxy.result = self.backend.result(resultproxy.proxy)
+            resultproxy.fetched = True
+        return resultproxy.result
+
+    def ready(self,resultproxy):
+        if isinstance(resultproxy,CachedResultProxy):
+            return True
+        return self.backend.ready(resultproxy.proxy)
+
+    def successful(self,resultproxy):
+        if isinstance(resultproxy,CachedResultProxy):
+            return True
+        successful = self.backend.successful(resultproxy.proxy)
+        if successful:
+            self._store(resultproxy)
+        return successful
+
+    def status_many(self,resultproxies):
+        missed = [proxy for proxy in resultproxies if isinstance(proxy,CacheMissProxy)]
+        if hasattr(self.backend,'status_many'):
+            reported = self.backend.status_many([proxy.proxy for proxy in missed])
+        else:
+            reported = [proxy_status(self.backend,proxy.proxy) for proxy in missed]
+        statuses = dict(zip(map(id,missed), reported))
+        for proxy in missed:
+            if statuses[id(proxy)] == nodestate.SUCCESS:
+                self._store(proxy)
+        return [statuses.get(id(proxy), nodestate.SUCCESS) for proxy in resultproxies]
+
+    def fail_info(self,resultproxy):
+        return self.backend.fail_info(resultproxy.proxy)
@@ -0,0 +1,70 @@
+import logging
+
+from adage.graph import DAGObserver
+
+log = logging.getLogger(__name__)
+
+class RuleIndex(DAGObserver):
+    '''
+    caches the predicate results of rules that declare the nodes they watch
+    (via a ``watches`` attribute holding node identifiers)
+
+    An index from node identifiers to the rules watching them is used to invalidate
+    the cached result when one of the watched nodes changes its state. Rules without
+    such a declaration are evaluated every time they are asked for.
+    '''
+    def __init__(self,dag):
+        self.dag = dag
+        self.cache = {}
+        self.watchers = {}
+        dag.addObserver(self)
+
+    def detach(self):
+        self.dag.removeObserver(self)
+
+    def applicable(self,rule,adageobj):
+        '''
+        :param rule: the rule to check
+        :param adageobj: the adage workflow object
+        :return: whether the rule's predicate is fulfilled
+        '''
+        watches = getattr(rule,'watches',None)
+        if watches is None:
+            return rule.applicable(adageobj)
+        cached = self.cache.get(id(rule))
+        if cached is None or cached[0] is not rule:
+            for node in watches:
+                self.watchers.setdefault(node,set()).add(id(rule))
+            cached = self.cache[id(rule)] = (rule, rule.applicable(adageobj))
+        return cached[1]
+
+    def applicable_rules(self,adageobj):
+        '''
+        generator over the open rules of the workflow whose predicate is fulfilled
+        '''
+        for rule in adageobj.rules:
+            if self.applicable(rule,adageobj):
+                yield rule
+            else:
+                log.debug('rule %s not ready yet',rule)
+
+    def forget(self,rules):
+        '''
+        drop the bookkeeping for rules that are no longer open
+        '''
+        for rule in rules:
+            cached = self.cache.pop(id(rule),None)
+            if cached is None:
+                continue
+            for node in getattr(rule,'watches',None) or []:
+                self.watchers.get(node,set()).discard(id(rule))
+
+    def _invalidate(self,nodeobj):
+        for ruleid in self.watchers.get(nodeobj.identifier,()):
+            self.cache.pop(ruleid,None)
+
+    def node_removed(self,nodeobj):
+        self._invalidate(nodeobj)
+
+    def state_changed(self,nodeobj,oldstate):
+        self._invalidate(nodeobj)
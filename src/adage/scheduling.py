@@ -0,0 +1,221 @@
+import logging
+
+
+from adage.graph import DAGObserver
+
+log = logging.getLogger(__name__)
+
+def task_attribute(task,attribute,default = None):
+    '''
+    look up scheduling metadata of a task. The attribute is looked up on the
+    task itself and, for partials (such as created by ``adagetask``'s ``.s``),
+    on the wrapped function.
+    '''
+    value = getattr(task,attribute,None)
+    if value is None:
+        value = getattr(getattr(task,'func',None),attribute,None)
+    return default if value is None else value
+
+def runtime_estimate(nodeobj):
+    '''
+    :return: the estimated runtime of the node's task (``runtime_estimate`` metadata), 1 by default
+    '''
+    return task_attribute(nodeobj.task,'runtime_estimate',1)
+
+class UpwardRanks(DAGObserver):
+    '''
+    upward rank of every node, i.e. the length of the longest path from the node
+    to any sink of the DAG, weighted by the runtime estimates of the nodes. Nodes
+    on the critical path have the highest ranks.
+
+    The ranks are updated incrementally as the DAG grows: a new edge can only raise
+    the ranks of the ancestors of its source node.
+    '''
+    def __init__(self,dag,estimate = runtime_estimate):
+        self.dag = dag
+        self.estimate = estimate
+        self.ranks = {}
+        self._recompute()
+        dag.addObserver(self)
+
+    def detach(self):
+        self.dag.removeObserver(self)
+
+    def _recompute(self):
+        self._stale = False
+        self.ranks = {}
+        for node in reversed(list(self.dag.topologicalSort())):
+            downstream = max([self.ranks[x] for x in self.dag.successors(node)] or [0])
+            self.ranks[node] = self.estimate(self.dag.getNode(node)) + downstream
+
+    def rank(self,nodeobj):
+        if self._stale:
+            self._recompute()
+        return self.ranks[nodeobj.identifier]
+
+    def prioritize(self,nodeobjs):
+        '''
+        :return: the nodes ordered by decreasing upward rank
+        '''
+        return sorted(nodeobjs, key = self.rank, reverse = True)
+
+    def node_added(self,nodeobj):
+        if self._stale:
+            return
+        self.ranks[nodeobj.identifier] = self.estimate(nodeobj)
+
+    def edge_added(self,fromobj,toobj):
+        if self._stale:
+            return
+        stack = [(fromobj.identifier, self.ranks[toobj.identifier])]
+        while stack:
+            node, downstream = stack.pop()
+            rank = self.estimate(self.dag.getNode(node)) + downstream
+            if rank <= self.ranks[node]:
+                continue
+            self.ranks[node] = rank
+            stack.extend((x, rank) for x in self.dag.predecessors(node))
+
+    def node_removed(self,nodeobj):
+        # removing a node can lower the ranks of its ancestors, which only happens rarely
+        # (e.g. when resetting parts of a workflow), so recompute from scratch
+        self._stale = True
+
+DEFAULT_REQUIREMENTS = {'cpu': 1}
+
+def resource_requirements(nodeobj):
+    '''
+    :return: the resources the node's task needs, from the node's ``resources`` or the
+        ``resources`` metadata of its task (e.g. ``{'cpu': 8, 'memory': 20e9}``)
+    '''
+    return nodeobj.resources or task_attribute(nodeobj.task,'resources',DEFAULT_REQUIREMENTS)
+
+class ResourceAllocator(DAGObserver):
+    '''
+    bookkeeping of the resources held by the in-flight nodes against the capacity
+    of the backend. Ready nodes are admitted first-fit (in the order given), nodes
+    that do not fit in the free capacity are held back. Resources without a declared
+    capacity are not limited.
+    '''
+    def __init__(self,dag,capacity,requirements = resource_requirements):
+        self.dag = dag
+        self.capacity = capacity
+        self.requirements = requirements
+        self.allocated = {}
+        self.used = {k: 0 for k in capacity}
+        for node in dag.nodes():
+            nodeobj = dag.getNode(node)
+            if nodeobj.resultproxy and not nodeobj.ready():
+                self._allocate(nodeobj)
+        dag.addObserver(self)
+
+    def detach(self):
+        self.dag.removeObserver(self)
+
+    def _fits(self,requirements):
+        return all(self.used[k] + v <= self.capacity[k] for k,v in requirements.items() if k in self.capacity)
+
+    def _allocate(self,nodeobj):
+        requirements = self.requirements(nodeobj)
+        self.allocated[nodeobj.identifier] = requirements
+        for k,v in requirements.items():
+            if k in self.used:
+                self.used[k] += v
+
+    def _release(self,nodeobj):
+        requirements = self.allocated.pop(nodeobj.identifier,None)
+        for k,v in (requirements or {}).items():
+            if k in self.used:
+                self.used[k] -= v
+
+    def admit(self,nodeobjs):
+        '''
+        :param nodeobjs: the nodes that are ready to be submitted
+        :return: the nodes that fit into the free capacity (their resources are allocated)
+        '''
+        admitted = []
+        for nodeobj in nodeobjs:
+            requirements = self.requirements(nodeobj)
+            if not self._fits(requirements):
+                if self.allocated:
+                    log.debug('holding back node %s, requires %s but in use are %s',nodeobj,requirements,self.used)
+                    continue
+                log.warning('node %s requires %s exceeding the capacity %s, running it on its own',nodeobj,requirements,self.capacity)
+            self._allocate(nodeobj)
+            admitted.append(nodeobj)
+        return admitted
+
+    def node_removed(self,nodeobj):
+        self._release(nodeobj)
+
+    def state_changed(self,nodeobj,oldstate):
+        if nodeobj.ready():
+            self._release(nodeobj)
+
+class SubmissionWindow(object):
+    '''
+    limit on the number of outstanding backend submissions, so that a wide scatter
+    does not flood the backend. Nodes sharing a submission (composite tasks,
+    deduplicated tasks) take a single slot. Ready nodes beyond the window wait in
+    the controller.
+
+    In adaptive mode the window follows an additive-increase/multiplicative-decrease
+    scheme: after a submission round whose per-task submit latency stayed below the
+    target it grows by one (if tasks completed in the meantime, i.e. the backend keeps
+    up), while a round exceeding the latency target halves it.
+    '''
+    def __init__(self,size,adaptive = False,latency_target = 0.05,minimum = 1,maximum = None,decrease = 0.5):
+        '''
+        :param size: (initial) number of outstanding submissions
+        :param adaptive: adapt the window size to the observed backend behaviour
+        :param latency_target: acceptable submit latency per task in seconds
+        :param minimum: lower bound of the adaptive window
+        :param maximum: upper bound of the adaptive window (unbounded by default)
+        :param decrease: factor applied to the window on overload
+        '''
+        self.size = size
+        self.adaptive = adaptive
+        self.latency_target = latency_target
+        self.minimum = minimum
+        self.maximum = maximum
+        self.decrease = decrease
+        self.completed = 0
+
+    def admit(self,nodeobjs,inflight,slots = None):
+        '''
+        :param nodeobjs: the nodes that are ready to be submitted
+        :param inflight: the number of currently outstanding submissions
+        :param slots: optional dictionary of node identifiers to the submission the
+            node will be part of. Nodes without an entry take a slot of their own.
+        :return: the nodes that fit into the window
+        '''
+        free = max(0, int(self.size) - inflight)
+        slots = slots or {}
+        admitted, taken = [], set()
+        for nodeobj in nodeobjs:
+            slot = slots.get(nodeobj.identifier, nodeobj.identifier)
+            if slot not in taken:
+                if len(taken) == free:
+                    continue
+                taken.add(slot)
+            admitted.append(nodeobj)
+        return admitted
+
+    def record_completions(self,ncompleted):
+        self.completed += ncompleted
+
+    def record_submission(self,nsubmitted,duration):
+        '''
+        :param nsubmitted: number of backend submissions made in the round
+        :param duration: time it took to submit them
+        '''
+        if not (self.adaptive and nsubmitted):
+            return
+        latency = duration / nsubmitted
+        if latency > self.latency_target:
+            self.size = max(self.minimum, self.size * self.decrease)
+            log.info('submit latency %.3fs above target, shrinking submission window to %s', latency, int(self.size))
+        elif self.completed:
+            self.size = self.size + 1 if self.maximum is None else min(self.maximum, self.size + 1)
+            log.debug('growing submission window to %s', int(self.size))
+        self.completed = 0
@@ -1,15 +1,18 @@
+import os
+import gzip
 import json
 import logging
+import itertools
 
 import adage.nodestate
-import adage.adageobject
 import adage.graph
+from adage.adageobject import adageobject
 
 log = logging.getLogger(__name__)
 
 class DefaultAdageEncoder(json.JSONEncoder):
     def default(self, obj):
-        if isinstance(obj, adage.adageobject):
+        if isinstance(obj, adageobject):
             return obj_to_json(obj)
         # Let the base class default method raise the TypeError
         return json.JSONEncoder.default(self, obj)
@@ -25,23 +28,14 @@ def noop_ruleserializer(rule):
 
 def obj_to_json(adageobj, ruleserializer, nodeserializer):
     dag, rules, applied = adageobj.dag, adageobj.rules, adageobj.applied_rules
-    data = {'dag':None, 'rules':None, 'applied':None}
-
-    data['dag'] = {'nodes':[], 'edges': []}
-    for node in dag.nodes():
-        nodeobj = dag.getNode(node)
-        data['dag']['nodes']+=[nodeserializer(nodeobj)]
-
-    data['dag']['edges'] += dag.edges()
-
-    data['rules'] = []
-    for rule in rules:
-        data['rules'] += [ruleserializer(rule)]
-
-    data['applied'] = []
-    for rule in applied:
-        data['applied'] += [ruleserializer(rule)]
-
+    data = {
+        'dag': {
+            'nodes': [nodeserializer(dag.getNode(node)) for node in dag.nodes()],
+            'edges': list(dag.edges())
+        },
+        'rules': [ruleserializer(rule) for rule in rules],
+        'applied': [ruleserializer(rule) for rule in applied]
+    }
     return data
 
 def node_to_json(nodeobj,taskserializer,proxyserializer):
@@ -67,15 +61,130 @@ def set_generic_data(node, data):
     node._state = getattr(adage.nodestate,data['state'])
 
 
-def dag_from_json(dagdata,nodedeserializer):
-    dag = adage.graph.AdageDAG()
+def dag_from_json(dagdata,nodedeserializer,dagclass = adage.graph.AdageDAG):
+    dag = dagclass()
 
     for x in dagdata['nodes']:
         node = nodedeserializer(x)
         dag.addNode(node)
 
-    for x in dagdata['edges']:
-        dag.addEdge(dag.getNode(x[0]),dag.getNode(x[1]))
-
-
+    dag.loadEdges(dagdata['edges'])
     return dag
+
+def open_snapshot(filename, mode = 'rb', compression = None):
+    '''
+    open a snapshot file, optionally (de)compressing it on the fly
+
+    :param filename: path of the file
+    :param mode: ``rb`` or ``wb``
+    :param compression: ``gzip``, ``zstd`` or None. By default it is chosen by the file
+        extension (``.gz`` or ``.zst``). zstd requires the ``zstandard`` package.
+    :return: a binary file object
+    '''
+    if compression is None:
+        compression = {'.gz': 'gzip', '.zst': 'zstd'}.get(os.path.splitext(filename)[1])
+    if compression == 'gzip':
+        return gzip.open(filename, mode)
+    if compression == 'zstd':
+        try:
+            import zstandard
+        except ImportError:
+            raise RuntimeError('zstd compression requires the zstandard package (pip install adage[snapshot])')
+        return zstandard.open(filename, mode)
+    if compression:
+        raise RuntimeError('unknown compression {}'.format(compression))
+    return open(filename, mode)
+
+class JSONLinesCodec(object):
+    '''
+    encodes snapshot records as one JSON document per line
+    '''
+    def pack(self,record):
+        return (json.dumps(record, separators = (',',':'))+'\n').encode('utf-8')
+
+    def unpack(self,fileobj):
+        for line in fileobj:
+            yield json.loads(line.decode('utf-8'))
+
+class MsgPackCodec(object):
+    '''
+    encodes snapshot records in the compact binary msgpack format (requires ``msgpack``)
+    '''
+    def __init__(self):
+        try:
+            import msgpack
+        except ImportError:
+            raise RuntimeError('the msgpack format requires the msgpack package (pip install adage[snapshot])')
+        self.msgpack = msgpack
+        self.packer = msgpack.Packer(use_bin_type = True)
+
+    def pack(self,record):
+        return self.packer.pack(record)
+
+    def unpack(self,fileobj):
+        return self.msgpack.Unpacker(fileobj, raw = False)
+
+snapshot_codecs = {
+    'json': JSONLinesCodec,
+    'msgpack': MsgPackCodec,
+}
+
+def write_snapshot(adageobj, fileobj, ruleserializer, nodeserializer, format = 'json', chunksize = 10000):
+    '''
+    stream a workflow to a file record by record, without building the full serialized
+    form in memory. Edges refer to the nodes by their position in the snapshot and are
+    written in chunks.
+
+    :param adageobj: the adage workflow object
+    :param fileobj: binary file object (c.f. :func:`open_snapshot`)
+    :param format: the record encoding, ``json`` (JSON lines) or ``msgpack``
+    :param chunksize: number of edges per record
+    '''
+    codec = snapshot_codecs[format]()
+    dag = adageobj.dag
+    fileobj.write(codec.pack({'snapshot': 'adage', 'version': 1}))
+    index = {}
+    for node in dag.nodes():
+        index[node] = len(index)
+        fileobj.write(codec.pack({'node': nodeserializer(dag.getNode(node))}))
+    edges = []
+    for fromnode, tonode in dag.edges():
+        edges.append([index[fromnode], index[tonode]])
+        if len(edges) == chunksize:
+            fileobj.write(codec.pack({'edges': edges}))
+            edges = []
+    if edges:
+        fileobj.write(codec.pack({'edges': edges}))
+    for rule in adageobj.rules:
+        fileobj.write(codec.pack({'rule': ruleserializer(rule)}))
+    for rule in adageobj.applied_rules:
+        fileobj.write(codec.pack({'applied': ruleserializer(rule)}))
+
+def read_snapshot(fileobj, nodedeserializer, ruledeserializer, format = 'json', dagclass = adage.graph.AdageDAG):
+    '''
+    load a workflow written by :func:`write_snapshot`, adding the edges in bulk as they are read
+
+    :param fileobj: binary file object (c.f. :func:`open_snapshot`)
+    :param dagclass: the graph store to load the workflow into
+    :return: the adage workflow object
+    '''
+    records = snapshot_codecs[format]().unpack(fileobj)
+    header = next(records, None)
+    if not header or header.get('snapshot') != 'adage':
+        raise RuntimeError('not an adage snapshot')
+    dag = dagclass()
+    rules, applied, identifiers = [], [], []
+    # records of a kind are consecutive (nodes, then edges, then rules)
+    for kind, group in itertools.groupby(records, lambda record: next(iter(record))):
+        if kind == 'node':
+            for record in group:
+                nodeobj = nodedeserializer(record['node'])
+                identifiers.append(nodeobj.identifier)
+                dag.addNode(nodeobj)
+        elif kind == 'edges':
+            dag.loadEdges((identifiers[i], identifiers[j]) for record in group for i, j in record['edges'])
+        elif kind == 'rule':
+            rules.extend(ruledeserializer(record['rule']) for record in group)
+        elif kind == 'applied':
+            applied.extend(ruledeserializer(record['applied']) for record in group)
+    return adageobject(dag, rules, applied)
@@ -0,0 +1,52 @@
+import logging
+
+import adage.nodestate as nodestate
+from adage.graph import DAGObserver
+
+log = logging.getLogger(__name__)
+
+OPEN_STATES = [nodestate.DEFINED, nodestate.RUNNING]
+
+class StateCounter(DAGObserver):
+    '''
+    live counters of the node states of a DAG, updated on state transitions
+
+    Besides the number of nodes per state, the counter keeps the number of
+    eligible open nodes, i.e. nodes that are defined or running and do not
+    have a failed upstream. The workflow can only be finished if there are none.
+    '''
+    def __init__(self,dag):
+        self.dag = dag
+        self.states = {state: 0 for state in [nodestate.DEFINED, nodestate.RUNNING, nodestate.SUCCESS, nodestate.FAILED]}
+        self.open_nodes = 0
+        for node in dag.nodes():
+            self.node_added(dag.getNode(node))
+        dag.addObserver(self)
+
+    def detach(self):
+        self.dag.removeObserver(self)
+
+    @property
+    def upstream_failed(self):
+        return len(self.dag.failed_upstream)
+
+    def _eligible(self,nodeobj,state):
+        return state in OPEN_STATES and not self.dag.upstreamFailed(nodeobj)
+
+    def node_added(self,nodeobj):
+        self.states[nodeobj.state] += 1
+        self.open_nodes += self._eligible(nodeobj,nodeobj.state)
+
+    def node_removed(self,nodeobj):
+        self.states[nodeobj.state] -= 1
+        self.open_nodes -= self._eligible(nodeobj,nodeobj.state)
+
+    def state_changed(self,nodeobj,oldstate):
+        self.states[oldstate] -= 1
+        self.states[nodeobj.state] += 1
+        self.open_nodes += self._eligible(nodeobj,nodeobj.state) - self._eligible(nodeobj,oldstate)
+
+    def upstream_failure_changed(self,nodeobj):
+        if nodeobj.state not in OPEN_STATES:
+            return
+        self.open_nodes += -1 if self.dag.upstreamFailed(nodeobj) else 1
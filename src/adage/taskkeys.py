@@ -0,0 +1,56 @@
+import json
+import hashlib
+import logging
+
+log = logging.getLogger(__name__)
+
+def function_name(func):
+    '''
+    :return: the qualified name of a module-level function, None for lambdas, nested
+        functions and bound methods, whose behaviour depends on more than their name
+    '''
+    qualname = getattr(func,'__qualname__',None)
+    module = getattr(func,'__module__',None)
+    if not (qualname and module) or '<' in qualname or hasattr(func,'__self__'):
+        return None
+    return '{}.{}'.format(module,qualname)
+
+def canonical(value):
+    '''
+    :return: a JSON-encodable form of the value that keeps its type, i.e. lists, tuples
+        and dictionaries are tagged and dictionary keys keep their type
+    :raises TypeError: for values of other types
+    '''
+    if value is None or isinstance(value,(bool,int,float,str)):
+        return value
+    if isinstance(value,list):
+        return ['list', [canonical(x) for x in value]]
+    if isinstance(value,tuple):
+        return ['tuple', [canonical(x) for x in value]]
+    if isinstance(value,dict):
+        items = [[canonical(k), canonical(v)] for k,v in value.items()]
+        return ['dict', sorted(items, key = lambda item: json.dumps(item[0]))]
+    raise TypeError('no canonical encoding for {}'.format(type(value)))
+
+def task_key(task,salt = ''):
+    '''
+    compute a stable content hash of a task, i.e. of the qualified name of the
+    function plus a canonical encoding of its arguments. Tasks are expected to be
+    partials (such as created by ``adagetask``'s ``.s``) or plain functions.
+
+    :param task: the task object
+    :param salt: optional string mixed into the hash (e.g. to version cached results)
+    :return: the hex digest, None if the task can not be encoded canonically
+    '''
+    func = getattr(task,'func',task)
+    name = function_name(func)
+    if name is None:
+        return None
+    args = getattr(task,'args',())
+    keywords = getattr(task,'keywords',None) or {}
+    try:
+        encoded = json.dumps([salt, name, canonical(tuple(args)), canonical(keywords)], separators = (',',':'))
+    except (TypeError, ValueError):
+        log.debug('arguments of task %s can not be encoded canonically', task)
+        return None
+    return hashlib.sha256(encoded.encode('utf-8')).hexdigest()
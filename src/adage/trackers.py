@@ -5,11 +5,11 @@ import shutil
 import json
 import subprocess
 from datetime  import datetime
-import networkx as nx
 import adage.visualize as viz
 import adage.serialize as serialize
 import adage.dagstate as dagstate
 import adage.nodestate as nodestate
+from adage.nodetable import node_table
 
 class JSONDumpTracker(object):
     def __init__(self,dumpname, serializer = serialize.DefaultAdageEncoder):
@@ -42,8 +42,9 @@ class GifTracker(object):
         if os.path.exists(self.workdir):
             shutil.rmtree(self.workdir)
         os.makedirs(self.workdir)
+        table = node_table(adageobj.dag)
         for i in range(self.frames+1):
-            viz.print_dag(adageobj.dag,'dag_{:02}'.format(i),self.workdir,time = i/float(self.frames))
+            viz.print_dag(adageobj.dag,'dag_{:02}'.format(i),self.workdir,time = i/float(self.frames),table = table)
         subprocess.check_call('convert -delay 50 $(ls {}/*.png|sort) {}'.format(self.workdir,self.gifname),shell = True)
         shutil.rmtree(self.workdir)
 
@@ -71,7 +72,7 @@ class TextSnapShotTracker(object):
         dag = adageobj.dag
         with open(self.logfilename,'a') as logfile:
             logfile.write('---------- snapshot at {}\n'.format(datetime.now().isoformat()))
-            for node in nx.topological_sort(dag):
+            for node in dag.topologicalSort():
                 nodeobj = dag.getNode(node)
                 submitted = nodeobj.submit_time is not None
                 logfile.write('name: {} obj: {} submitted: {}\n'.format(
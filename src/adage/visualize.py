@@ -21,17 +21,23 @@ def state_at_time(nodeobj,time):
         return nodeobj.state
     return nodestate.DEFINED
 
-def colorize_graph(dag,normtime = None):
+def colorize_graph(dag,normtime = None,table = None):
+    '''
+    :param table: optional :class:`adage.nodetable.NodeTable` of the DAG to compute the time range and states from
+    '''
     allnodes = dag.nodes()
     if allnodes:
-        start = min(filter(lambda x: x,[dag.getNode(n).define_time for n in allnodes]))
-        stop  = max(filter(lambda x: x,[dag.getNode(n).ready_by_time for n in allnodes]))
+        if table is not None:
+            start, stop = table.time_range()
+        else:
+            start = min(filter(lambda x: x,[dag.getNode(n).define_time for n in allnodes]))
+            stop  = max(filter(lambda x: x,[dag.getNode(n).ready_by_time for n in allnodes]))
         time = start + normtime*(stop-start)
     else:
         time = 0
-    return colorize_graph_at_time(dag,time)
+    return colorize_graph_at_time(dag,time,table)
 
-def colorize_graph_at_time(dag,time):
+def colorize_graph_at_time(dag,time,table = None):
     colorized = nx.DiGraph()
     colorkey = {
         None : None,
@@ -41,10 +47,11 @@ def colorize_graph_at_time(dag,time):
         nodestate.SUCCESS : 'green'
     }
 
+    states = table.node_states_at(time) if table is not None else None
     for node in dag.nodes():
         nodeobj = dag.getNode(node)
 
-        state   = state_at_time(nodeobj,time)
+        state   = states[node] if states is not None else state_at_time(nodeobj,time)
         color   = colorkey[state]
         visible = node_visible(nodeobj,time)
 
@@ -68,6 +75,6 @@ def save_dot(dotstring,filename,fileformat):
         p = subprocess.Popen(['dot', '-T{}'.format(fileformat), r'-Gsize=18,12\!', '-Gdpi=100'], stdout = dotoutputfile, stdin = subprocess.PIPE)
         p.communicate(dotstring.encode('ascii'))
 
-def print_dag(dag,name,trackdir,time = None):
+def print_dag(dag,name,trackdir,time = None,table = None):
     pngfilename = '{}/{}.png'.format(trackdir,name)
-    save_dot(colorize_graph(dag,time).to_string(),pngfilename,'png')
+    save_dot(colorize_graph(dag,time,table).to_string(),pngfilename,'png')
@@ -1,17 +1,69 @@
 import adage.controllerutils as ctrlutils
 import logging
+import time
 import adage.nodestate as nodestate
+from adage.readyqueue import ReadyQueue
+from adage.statecounter import StateCounter
+from adage.inflight import InFlightTracker
+from adage.ruleindex import RuleIndex
+from adage.scheduling import UpwardRanks, ResourceAllocator, SubmissionWindow
+from adage.composite import CompositeTracker, MicroBatcher, find_chain, submit_composites
+from adage.taskkeys import task_key
+from adage.nodetable import NodeTable
 
 log = logging.getLogger(__name__)
 
 class BaseController(object):
 
-    def __init__(self, adageobj, backend = None):
+    #incremental bookkeeping kept alongside the workflow graph, built on first use
+    observer_types = {
+        'readyqueue': ReadyQueue,
+        'statecounter': StateCounter,
+        'inflight': InFlightTracker,
+        'ruleindex': RuleIndex,
+        'ranks': UpwardRanks,
+        'composites': CompositeTracker,
+        'nodetable': NodeTable,
+    }
+
+    def __init__(self, adageobj, backend = None, incremental_sync = True, prioritize = False, capacity = None,
+                 max_inflight = None, adaptive_window = False, fuse_chains = False,
+                 max_batch = None, max_batch_wait = 0, deduplicate = False):
         '''
         :param backend: the desired backend to which to submit nodes
+        :param incremental_sync: only poll submitted nodes that did not finish yet when syncing with the backend.
+            Ready nodes submitted without announcing it to the DAG (c.f. ``nodesSubmitted``) are
+            picked up from the ready queue
+        :param prioritize: hand out and submit ready nodes in order of their upward rank (critical path first)
+        :param capacity: resources available for the tasks (e.g. ``{'cpu': 16, 'memory': 64e9}``) or ``True``
+            to use the capacity advertised by the backend (via its ``capacity()`` method, which not all
+            backends provide). Nodes are only submitted if their requirements
+            fit into the free capacity. By default resources are not managed.
+        :param max_inflight: maximum number of outstanding result proxies (unlimited by default)
+        :param adaptive_window: adapt the number of outstanding proxies (starting from ``max_inflight``)
+            to the submit latency and completion throughput of the backend
+        :param fuse_chains: submit linear chains of nodes (whose intermediate nodes have no other
+            consumers and are not watched by rules) as one composite task. Requires a backend
+            that accepts arbitrary callables (e.g. the multiprocessing or IPython backends).
+        :param max_batch: coalesce ready sibling nodes wrapping the same task function into composite
+            tasks of up to this many tasks (same backend requirement as for ``fuse_chains``)
+        :param max_batch_wait: time in seconds to hold back incomplete batches waiting for more siblings
+        :param deduplicate: attach nodes whose task (same function and arguments) was already submitted
+            in this run to the existing result proxy instead of submitting the task again
         '''
+        self.incremental_sync = incremental_sync
+        self.prioritize = prioritize
+        self.capacity = capacity
+        self.window = SubmissionWindow(max_inflight, adaptive = adaptive_window) if max_inflight else None
+        self.fuse_chains = fuse_chains
+        self.batcher = MicroBatcher(max_batch, max_batch_wait) if max_batch else None
+        self.deduplicate = deduplicate
+        self.dedup_stats = {'hits': 0, 'misses': 0}
+        self._submitted_tasks = {}
         self._backend  = None
         self._adageobj = None
+        self._attached_dag = None
+        self._observers = {}
 
         self.backend  = backend
         self.adageobj = adageobj
@@ -25,6 +77,58 @@ class BaseController(object):
         self._adageobj = adageobj
         if self.backend:
             ctrlutils.connect_backend(self.adageobj,self.backend)
+        self._detach()
+
+    def _detach(self):
+        for observer in self._observers.values():
+            observer.detach()
+        self._observers = {}
+        self._attached_dag = None
+
+    def _observer(self,name,factory = None):
+        '''
+        :return: the named bookkeeping object, (re-)built if the workflow graph was replaced
+        '''
+        if self._attached_dag is not self.adageobj.dag:
+            self._detach()
+            self._attached_dag = self.adageobj.dag
+        if name not in self._observers:
+            factory = factory or self.observer_types[name]
+            self._observers[name] = factory(self._attached_dag)
+        return self._observers[name]
+
+    @property
+    def readyqueue(self):
+        return self._observer('readyqueue')
+
+    @property
+    def statecounter(self):
+        return self._observer('statecounter')
+
+    @property
+    def inflight(self):
+        return self._observer('inflight')
+
+    @property
+    def ruleindex(self):
+        return self._observer('ruleindex')
+
+    @property
+    def ranks(self):
+        return self._observer('ranks')
+
+    @property
+    def nodetable(self):
+        '''
+        the :class:`adage.nodetable.NodeTable` of the workflow graph (requires numpy)
+        '''
+        return self._observer('nodetable')
+
+    @property
+    def resources(self):
+        if not self.capacity:
+            return None
+        return self._observer('resources', lambda dag: ResourceAllocator(dag, self.backend.capacity() if self.capacity is True else self.capacity))
 
     @property
     def backend(self):
@@ -32,6 +136,8 @@ class BaseController(object):
 
     @backend.setter
     def backend(self,backend):
+        if self.capacity is True and backend is not None and not hasattr(backend,'capacity'):
+            raise RuntimeError('backend {} does not advertise its capacity, pass the capacity explicitly'.format(type(backend).__name__))
         self._backend = backend
         if self.adageobj:
             ctrlutils.connect_backend(self.adageobj,backend)
@@ -42,7 +148,107 @@ class BaseController(object):
 
         Nodes are expected to be provided in same form as what the controller returns.
         '''
+        if self.prioritize:
+            nodes = self.ranks.prioritize(nodes)
+        if self.deduplicate:
+            nodes, keys = self._attach_duplicates(nodes)
+        if self.batcher:
+            nodes = self.batcher.hold(nodes)
+        if self.window:
+            slots = self.batcher.slots(nodes) if self.batcher else None
+            nodes = self.window.admit(nodes, self.inflight.submissions, slots)
+        if self.resources:
+            nodes = self.resources.admit(nodes)
+        start = time.time()
+        ncomposites = 0
+        if self.fuse_chains:
+            nodes, nchains = self._submit_chains(nodes)
+            ncomposites += nchains
+        if self.batcher:
+            nodes, nbatches = self._submit_batches(nodes)
+            ncomposites += nbatches
         ctrlutils.submit_nodes(nodes, self.backend)
+        if self.window:
+            self.window.record_submission(len(nodes) + ncomposites, time.time() - start)
+        self.adageobj.dag.nodesSubmitted(nodes)
+        if self.deduplicate:
+            self._register_tasks(keys)
+
+    def _attach_duplicates(self,nodes):
+        '''
+        attaches nodes whose task was already submitted to the result proxy of the
+        earlier submission. Repeated tasks within the same round wait for the first
+        one to be submitted.
+
+        :return: tuple of the nodes which still need to be submitted and a dictionary
+            of their task keys (to be registered with :meth:`_register_tasks`)
+        '''
+        remaining, duplicates, keys = [], [], {}
+        finished = False
+        for nodeobj in nodes:
+            key = task_key(nodeobj.task)
+            if key is None:
+                remaining.append(nodeobj)
+                continue
+            original = self._submitted_tasks.get(key)
+            if original is not None and original.submit_time:
+                self.dedup_stats['hits'] += 1
+                log.debug('task of node %s was already submitted for node %s', nodeobj, original)
+                nodeobj.resultproxy = original.resultproxy
+                nodeobj.backend = original.backend
+                nodeobj.submit_time = time.time()
+                duplicates.append(nodeobj)
+                if original.ready():
+                    # the completion of the task was already announced
+                    finished = True
+            elif key not in keys:
+                keys[key] = nodeobj
+                remaining.append(nodeobj)
+        self.adageobj.dag.nodesSubmitted(duplicates)
+        completions = getattr(self.backend,'completions',None)
+        if finished and completions is not None:
+            completions.notify()
+        return remaining, keys
+
+    def _register_tasks(self,keys):
+        for key, nodeobj in keys.items():
+            if nodeobj.submit_time:
+                self.dedup_stats['misses'] += 1
+                self._submitted_tasks[key] = nodeobj
+
+    def _watched(self,nodeobj):
+        return bool(self.ruleindex.watchers.get(nodeobj.identifier))
+
+    def _submit_chains(self,nodes):
+        '''
+        submits the chains starting at the given nodes as composite tasks
+
+        :return: tuple of the nodes which are not part of a chain and still need to be
+            submitted and the number of composite tasks submitted
+        '''
+        self._observer('composites')
+        chains = [find_chain(self.adageobj.dag, nodeobj, self._watched) for nodeobj in nodes]
+        chains = [chain for chain in chains if len(chain) > 1]
+        if chains:
+            log.info('fusing %s chains of in total %s nodes', len(chains), sum(len(chain) for chain in chains))
+            submit_composites(chains, self.backend)
+            self.adageobj.dag.nodesSubmitted([nodeobj for chain in chains for nodeobj in chain])
+        return [nodeobj for nodeobj in nodes if not nodeobj.submit_time], len(chains)
+
+    def _submit_batches(self,nodes):
+        '''
+        submits batches of sibling nodes as composite tasks
+
+        :return: tuple of the nodes which are not part of a batch and still need to be
+            submitted and the number of composite tasks submitted
+        '''
+        self._observer('composites')
+        batches, singles = self.batcher.group(nodes)
+        if batches:
+            log.info('batching %s nodes into %s tasks', sum(len(batch) for batch in batches), len(batches))
+            submit_composites(batches, self.backend, stop_on_failure = False)
+            self.adageobj.dag.nodesSubmitted([nodeobj for batch in batches for nodeobj in batch])
+        return singles, len(batches)
 
     def apply_rules(self, rules):
         '''
@@ -51,33 +257,42 @@ class BaseController(object):
         Rules are expected to be provided in same form as what the controller returns.
         '''
         ctrlutils.apply_rules(self.adageobj, rules)
+        self.ruleindex.forget(rules)
+        self.adageobj.dag.rulesApplied(rules)
 
     def applicable_rules(self):
         '''
         :return: return a list of rules whose predicate is fulfilled
         '''
-        return ctrlutils.applicable_rules(self.adageobj)
+        return self.ruleindex.applicable_rules(self.adageobj)
 
     def submittable_nodes(self):
         '''
         :return: a list of nodes with sucessfull and completed upstream
         '''
-        return ctrlutils.submittable_nodes(self.adageobj)
+        if self.prioritize:
+            return self.ranks.prioritize(self.readyqueue.submittable())
+        return self.readyqueue.submittable()
 
     def finished(self):
         '''
         :return: boolean indicating if nodes or rules are still left to be submitted/applied
         '''
-        return not ctrlutils.nodes_left_or_rule_applicable(self.adageobj)
+        if self.statecounter.open_nodes:
+            log.debug('%s nodes that could be run or are running are left.',self.statecounter.open_nodes)
+            return False
+        if any(self.ruleindex.applicable(rule,self.adageobj) for rule in self.adageobj.rules):
+            return False
+        log.info('no nodes can be run anymore and no rules are applicable')
+        return True
 
     def successful(self):
         '''
         :return: boolean indicating workflow execution was successful
         '''
-        if not self.finished(): #will sync backend here
+        if not self.finished():
             return False
-        failed = any(self.adageobj.dag.getNode(x).state == nodestate.FAILED for x in self.adageobj.dag.nodes())
-        return (not failed)
+        return not self.statecounter.states[nodestate.FAILED]
 
     def validate(self):
         '''
@@ -87,8 +302,46 @@ class BaseController(object):
             return False
         return True
 
+    def wait(self, update_interval, max_idle_interval = None):
+        '''
+        wait until the workflow state may have changed
+
+        If the backend pushes completion notifications (via a ``completions`` queue) and
+        tasks are in flight, this blocks until one of them finished. Otherwise it just
+        sleeps for the update interval.
+
+        :param update_interval: time to sleep when polling
+        :param max_idle_interval: maximum time to block while waiting for a notification
+        '''
+        completions, timeout = self._completion_wait(max_idle_interval)
+        if completions is None:
+            time.sleep(update_interval)
+            return
+        completions.wait(timeout)
+
+    def _completion_wait(self, max_idle_interval):
+        '''
+        :return: tuple of the backend's completion queue to block on (None if polling is
+            needed) and the maximum time to block
+        '''
+        completions = getattr(self.backend,'completions',None)
+        if completions is None or not len(self.inflight):
+            return None, None
+        if self.batcher and self.batcher.holding:
+            max_idle_interval = min(max_idle_interval or self.batcher.max_wait, self.batcher.max_wait)
+        return completions, max_idle_interval
+
     def sync_backend(self):
         '''
         :return: synchronize with backend to update workflow state
         '''
-        return ctrlutils.sync_state(self.adageobj,self.backend)
+        if self.incremental_sync:
+            # nodes submitted bypassing submit_nodes are picked up from the ready queue
+            self.inflight.add(self.readyqueue.take_unannounced())
+        inflight = self.inflight.submissions if self.window else 0
+        if not self.incremental_sync:
+            ctrlutils.sync_state(self.adageobj,self.backend)
+        else:
+            ctrlutils.sync_state(self.adageobj,self.backend, nodes = self.inflight.nodes())
+        if self.window:
+            self.window.record_completions(inflight - self.inflight.submissions)
@@ -1,4 +1,6 @@
 import adage
+import os
+import functools
 import logging
 import time
 import adage.serialize
@@ -65,3 +67,711 @@ def test_simpleexample():
 
     data = adage.serialize.obj_to_json(adageobj,lambda r: None, lambda n: adage.serialize.node_to_json(n,lambda t: {}, lambda p: {}))
     adage.serialize.dag_from_json(data['dag'], lambda n: adage.node.Node(n['name'],n['task'],n['id']))
+
+class syncbackend(object):
+    '''backend that runs tasks right away at submission'''
+    def __init__(self):
+        self.submitted = []
+        self.polled = 0
+
+    def submit(self,task):
+        self.submitted.append(task)
+        try:
+            return {'success': True, 'result': task()}
+        except Exception as e:
+            return {'success': False, 'result': e}
+
+    def result(self,resultproxy):
+        return resultproxy['result']
+
+    def ready(self,resultproxy):
+        self.polled += 1
+        return True
+
+    def successful(self,resultproxy):
+        return resultproxy['success']
+
+    def fail_info(self,resultproxy):
+        return resultproxy['result']
+
+def test_readyqueue():
+    adageobj = adage.adageobject()
+    one = adageobj.dag.addTask(task.s(one = 'one'), nodename = 'one')
+    two = adageobj.dag.addTask(task.s(one = 'two'), nodename = 'two', depends_on = [one])
+    three = adageobj.dag.addTask(task.s(one = 'three'), nodename = 'three', depends_on = [one])
+    controller = adage.BaseController(adageobj, syncbackend())
+
+    assert list(controller.submittable_nodes()) == [one]
+    controller.submit_nodes([one])
+    assert list(controller.submittable_nodes()) == []
+    controller.sync_backend()
+    assert list(controller.submittable_nodes()) == [two, three]
+
+    four = adageobj.dag.addTask(task.s(one = 'four'), nodename = 'four', depends_on = [two])
+    controller.submit_nodes([two])
+    assert list(controller.submittable_nodes()) == [three]
+    controller.sync_backend()
+    assert list(controller.submittable_nodes()) == [three, four]
+
+def failing():
+    raise RuntimeError('failing task')
+
+def test_upstream_failure():
+    adageobj = adage.adageobject()
+    dag = adageobj.dag
+    one = dag.addTask(failing, nodename = 'one')
+    two = dag.addTask(task.s(one = 'two'), nodename = 'two', depends_on = [one])
+    three = dag.addTask(task.s(one = 'three'), nodename = 'three', depends_on = [one])
+    four = dag.addTask(task.s(one = 'four'), nodename = 'four', depends_on = [two, three])
+    controller = adage.BaseController(adageobj, syncbackend())
+
+    assert not any(adage.dagstate.upstream_failure(dag, n) for n in [one, two, three, four])
+    controller.submit_nodes([one])
+    controller.sync_backend()
+    assert one.state == adage.nodestate.FAILED
+    assert not adage.dagstate.upstream_failure(dag, one)
+    assert all(adage.dagstate.upstream_failure(dag, n) for n in [two, three, four])
+
+    five = dag.addTask(task.s(one = 'five'), nodename = 'five', depends_on = [four])
+    assert adage.dagstate.upstream_failure(dag, five)
+    assert controller.statecounter.states[adage.nodestate.FAILED] == 1
+    assert controller.statecounter.upstream_failed == 4
+    assert controller.statecounter.open_nodes == 0
+    assert controller.finished()
+    assert not controller.successful()
+
+def test_incremental_sync():
+    adageobj = adage.adageobject()
+    one = adageobj.dag.addTask(task.s(one = 'one'), nodename = 'one')
+    two = adageobj.dag.addTask(task.s(one = 'two'), nodename = 'two')
+    backend = syncbackend()
+    controller = adage.BaseController(adageobj, backend)
+    controller.submit_nodes([one, two])
+    assert len(controller.inflight) == 2
+    controller.sync_backend()
+    assert len(controller.inflight) == 0
+    polled = backend.polled
+    controller.sync_backend()
+    assert backend.polled == polled
+    assert one.successful() and two.successful()
+
+    three = adageobj.dag.addTask(task.s(one = 'three'), nodename = 'three', depends_on = [one])
+    four = adageobj.dag.addTask(task.s(one = 'four'), nodename = 'four', depends_on = [three])
+    adage.controllerutils.submit_nodes([three], backend)
+    controller.sync_backend()
+    assert three.successful()
+    assert [n.name for n in controller.submittable_nodes()] == ['four']
+
+class bulkbackend(syncbackend):
+    def __init__(self):
+        super(bulkbackend,self).__init__()
+        self.bulkqueries = 0
+
+    def status_many(self,resultproxies):
+        self.bulkqueries += 1
+        return [adage.nodestate.SUCCESS if p['success'] else adage.nodestate.FAILED for p in resultproxies]
+
+def test_bulk_status():
+    adageobj = adage.adageobject()
+    nodes = [adageobj.dag.addTask(task.s(one = i), nodename = 'node') for i in range(3)]
+    nodes += [adageobj.dag.addTask(failing, nodename = 'failing')]
+    backend = bulkbackend()
+    controller = adage.BaseController(adageobj, backend)
+    controller.submit_nodes(nodes)
+    controller.sync_backend()
+    assert backend.bulkqueries == 1
+    assert backend.polled == 0
+    assert [n.state for n in nodes] == [adage.nodestate.SUCCESS]*3 + [adage.nodestate.FAILED]
+
+class fakeipyclient(object):
+    def __init__(self):
+        self.outstanding = set(['running'])
+        self.metadata = {'done': {'status': 'ok'}, 'error': {'status': 'error'}, 'running': {}}
+
+    def load_balanced_view(self):
+        return None
+
+    def spin(self):
+        pass
+
+    def result_status(self, msg_ids, status_only = True):
+        raise RuntimeError('remote task failed')
+
+class fakeipyproxy(object):
+    def __init__(self, msg_id):
+        self.msg_ids = [msg_id]
+
+def test_ipython_status_many():
+    from adage.backends import IPythonParallelBackend
+    backend = IPythonParallelBackend(fakeipyclient())
+    proxies = [fakeipyproxy(x) for x in ['done', 'error', 'running']]
+    assert backend.status_many(proxies) == [adage.nodestate.SUCCESS, adage.nodestate.FAILED, adage.nodestate.RUNNING]
+
+def test_completion_notifications():
+    from adage.backends import MultiProcBackend
+    backend = MultiProcBackend(1)
+    try:
+        proxy = backend.submit(task.s(one = 'notify'))
+        assert backend.completions.wait(timeout = 5) == 1
+        assert backend.ready(proxy)
+        assert backend.completions.wait(timeout = 0.01) == 0
+    finally:
+        backend.close()
+
+def test_arundag():
+    import asyncio
+    from adage.backends import MultiProcBackend
+    submitted = []
+    async def submit_decider(data):
+        nodeobj, controller = data
+        submitted.append(nodeobj.name)
+        return True
+
+    def workflow(name):
+        adageobj = adage.adageobject()
+        one = adageobj.dag.addTask(task.s(one = name), nodename = name)
+        adageobj.dag.addTask(task.s(one = name), nodename = name, depends_on = [one])
+        return adageobj
+
+    workflows = [workflow('first'), workflow('second')]
+    backends = [MultiProcBackend(2) for w in workflows]
+    async def main():
+        await asyncio.gather(*[
+            adage.arundag(w, backend = b, default_trackers = False, submit_decider = submit_decider)
+            for w, b in zip(workflows, backends)
+        ])
+    try:
+        asyncio.run(main())
+    finally:
+        for backend in backends:
+            backend.close()
+    assert sorted(submitted) == ['first']*2 + ['second']*2
+    assert all(w.dag.getNode(n).successful() for w in workflows for n in w.dag.nodes())
+
+def test_node_ready():
+    import asyncio
+    from adage.asyncexec import in_executor
+    adageobj = adage.adageobject()
+    one = adageobj.dag.addTask(task.s(one = 'one'), nodename = 'one')
+    controller = adage.AsyncController(adageobj, syncbackend())
+    async def main():
+        ready = controller.node_ready(one)
+        await in_executor(controller.submit_nodes, [one])
+        assert not ready.done()
+        await in_executor(controller.sync_backend)
+        return await asyncio.wait_for(ready, 5)
+    assert asyncio.run(main()) == adage.nodestate.SUCCESS
+
+def test_rule_watches():
+    from adage.decorators import callbackrule
+    adageobj = adage.adageobject()
+    one = adageobj.dag.addTask(task.s(one = 'one'), nodename = 'one')
+
+    @callbackrule(after = {'one': one.identifier})
+    def rule(depnodes, adageobj):
+        adageobj.dag.addTask(task.s(one = 'two'), nodename = 'two', depends_on = [depnodes['one']])
+
+    evaluated = []
+    predicate = rule.predicate
+    def counting(adageobj):
+        evaluated.append(True)
+        return predicate(adageobj)
+    rule.predicate = counting
+    adageobj.rules.append(rule)
+    assert rule.watches == [one.identifier]
+
+    controller = adage.BaseController(adageobj, syncbackend())
+    for i in range(3):
+        assert list(controller.applicable_rules()) == []
+        controller.sync_backend()
+    assert len(evaluated) == 1
+
+    controller.submit_nodes([one])
+    controller.sync_backend()
+    assert list(controller.applicable_rules()) == [rule]
+    assert len(evaluated) == 2
+    controller.apply_rules([rule])
+    assert adageobj.dag.getNodeByName('two')
+
+def test_rulelist():
+    adageobj = adage.adageobject()
+    rules = [rl() for i in range(4)]
+    adageobj.rules += rules
+    for rule in adageobj.rules:
+        adageobj.rules.remove(rule)
+        adageobj.rules.append(rl())
+    assert len(adageobj.rules) == 4
+    batch = adageobj.rules[1:3]
+    adageobj.rules.transfer(batch, adageobj.applied_rules)
+    assert adageobj.applied_rules == batch
+    assert len(adageobj.rules) == 2 and not any(r in adageobj.rules for r in batch)
+
+@adage.adagetask(runtime_estimate = 10)
+def longtask(one):
+    pass
+
+def test_prioritize():
+    adageobj = adage.adageobject()
+    dag = adageobj.dag
+    leaf = dag.addTask(task.s(one = 'leaf'), nodename = 'leaf')
+    chain = [dag.addTask(task.s(one = 'chain'), nodename = 'chain')]
+    for i in range(2):
+        chain.append(dag.addTask(task.s(one = 'chain'), nodename = 'chain', depends_on = [chain[-1]]))
+    controller = adage.BaseController(adageobj, syncbackend(), prioritize = True)
+    assert list(controller.submittable_nodes()) == [chain[0], leaf]
+    assert controller.ranks.rank(chain[0]) == 3
+
+    heavy = dag.addTask(longtask.s(one = 'heavy'), nodename = 'heavy')
+    assert list(controller.submittable_nodes()) == [heavy, chain[0], leaf]
+    dag.addEdge(leaf, dag.addTask(longtask.s(one = 'heavy'), nodename = 'heavy'))
+    assert controller.ranks.rank(leaf) == 11
+    controller.submit_nodes([chain[0], leaf, heavy])
+    assert [t.keywords['one'] for t in controller.backend.submitted] == ['leaf', 'heavy', 'chain']
+
+class pendingbackend(syncbackend):
+    '''backend whose tasks only finish when told to'''
+    def submit(self,task):
+        proxy = super(pendingbackend,self).submit(task)
+        proxy['done'] = False
+        return proxy
+
+    def ready(self,resultproxy):
+        return resultproxy['done']
+
+@adage.adagetask(resources = {'cpu': 4})
+def bigtask(one):
+    pass
+
+def test_resources():
+    adageobj = adage.adageobject()
+    dag = adageobj.dag
+    big = dag.addTask(bigtask.s(one = 'big'), nodename = 'big')
+    small = [dag.addTask(task.s(one = i), nodename = 'small') for i in range(3)]
+    controller = adage.BaseController(adageobj, pendingbackend(), capacity = {'cpu': 4})
+    controller.submit_nodes([big] + small)
+    assert big.submit_time and not any(n.submit_time for n in small)
+    assert controller.resources.used == {'cpu': 4}
+
+    big.resultproxy['done'] = True
+    controller.sync_backend()
+    assert controller.resources.used == {'cpu': 0}
+    controller.submit_nodes(list(controller.submittable_nodes()))
+    assert all(n.submit_time for n in small)
+    assert controller.resources.used == {'cpu': 3}
+
+    try:
+        adage.BaseController(adageobj, pendingbackend(), capacity = True)
+        assert False
+    except RuntimeError:
+        pass
+
+def test_submission_window():
+    adageobj = adage.adageobject()
+    nodes = [adageobj.dag.addTask(task.s(one = i), nodename = 'node') for i in range(5)]
+    controller = adage.BaseController(adageobj, pendingbackend(), max_inflight = 2)
+    controller.submit_nodes(list(controller.submittable_nodes()))
+    assert [bool(n.submit_time) for n in nodes] == [True, True, False, False, False]
+    controller.submit_nodes(list(controller.submittable_nodes()))
+    assert len(controller.inflight) == 2
+
+    nodes[0].resultproxy['done'] = True
+    controller.sync_backend()
+    controller.submit_nodes(list(controller.submittable_nodes()))
+    assert [bool(n.submit_time) for n in nodes] == [True, True, True, False, False]
+
+def test_submission_window_batches():
+    adageobj = adage.adageobject()
+    nodes = [adageobj.dag.addTask(task.s(one = i), nodename = 'node') for i in range(5)]
+    backend = pendingbackend()
+    controller = adage.BaseController(adageobj, backend, max_inflight = 2, max_batch = 2)
+    controller.window.record_submission = lambda nsubmitted, duration: submissions.append(nsubmitted)
+    submissions = []
+    controller.submit_nodes(list(controller.submittable_nodes()))
+    # two batches fill the window of two backend submissions
+    assert [bool(n.submit_time) for n in nodes] == [True]*4 + [False]
+    assert len(backend.submitted) == 2
+    assert submissions == [2]
+    assert len(controller.inflight) == 4 and controller.inflight.submissions == 2
+
+def test_adaptive_window():
+    from adage.scheduling import SubmissionWindow
+    window = SubmissionWindow(10, adaptive = True, latency_target = 0.1)
+    window.record_submission(10, 0.1)
+    assert window.size == 10
+    window.record_completions(3)
+    window.record_submission(10, 0.1)
+    assert window.size == 11
+    window.record_submission(10, 5.0)
+    assert window.size == 5.5
+
+class batchbackend(syncbackend):
+    def __init__(self):
+        super(batchbackend,self).__init__()
+        self.batches = []
+
+    def submit_many(self,tasks):
+        self.batches.append(len(tasks))
+        return [self.submit(t) for t in tasks]
+
+def test_submit_many():
+    adageobj = adage.adageobject()
+    nodes = [adageobj.dag.addTask(task.s(one = i), nodename = 'node') for i in range(3)]
+    backend = batchbackend()
+    controller = adage.BaseController(adageobj, backend)
+    controller.submit_nodes(list(controller.submittable_nodes()))
+    assert backend.batches == [3]
+    assert len(set(n.submit_time for n in nodes)) == 1
+    controller.sync_backend()
+    assert all(n.successful() for n in nodes)
+
+def test_fuse_chains():
+    adageobj = adage.adageobject()
+    dag = adageobj.dag
+    chain = [dag.addTask(task.s(one = 'chain'), nodename = 'chain')]
+    for i in range(2):
+        chain.append(dag.addTask(task.s(one = 'chain'), nodename = 'chain', depends_on = [chain[-1]]))
+    first, second = [dag.addTask(task.s(one = 'fork'), nodename = 'fork', depends_on = [chain[-1]]) for i in range(2)]
+    broken = [dag.addTask(task.s(one = 'broken'), nodename = 'broken')]
+    broken.append(dag.addTask(failing, nodename = 'broken', depends_on = [broken[-1]]))
+    broken.append(dag.addTask(task.s(one = 'broken'), nodename = 'broken', depends_on = [broken[-1]]))
+
+    backend = syncbackend()
+    controller = adage.BaseController(adageobj, backend, fuse_chains = True)
+    controller.submit_nodes(list(controller.submittable_nodes()))
+    assert len(backend.submitted) == 2
+    controller.sync_backend()
+    assert all(n.successful() for n in chain)
+    assert [n.state for n in broken] == [adage.nodestate.SUCCESS, adage.nodestate.FAILED, adage.nodestate.DEFINED]
+    assert broken[1].backend.fail_info(broken[1].resultproxy)[0] is RuntimeError
+    assert broken[-1].submit_time is None and broken[-1].resultproxy is None
+    assert dag.upstreamFailed(broken[-1])
+    assert controller.statecounter.states[adage.nodestate.FAILED] == 1
+    assert broken[-1] not in controller.inflight.nodes()
+
+    controller.submit_nodes(list(controller.submittable_nodes()))
+    assert len(backend.submitted) == 4
+    controller.sync_backend()
+    assert first.successful() and second.successful()
+    assert controller.validate()
+
+def test_micro_batching():
+    adageobj = adage.adageobject()
+    dag = adageobj.dag
+    siblings = [dag.addTask(task.s(one = i), nodename = 'sibling') for i in range(5)]
+    siblings.append(dag.addTask(failing, nodename = 'other'))
+    backend = syncbackend()
+    controller = adage.BaseController(adageobj, backend, max_batch = 2, max_batch_wait = 60)
+    controller.submit_nodes(list(controller.submittable_nodes()))
+    # two full batches and the unbatchable task, one sibling is held back
+    assert len(backend.submitted) == 3
+    assert [bool(n.submit_time) for n in siblings] == [True]*4 + [False, True]
+    controller.sync_backend()
+    assert all(n.successful() for n in siblings[:4])
+    assert siblings[-1].state == adage.nodestate.FAILED
+
+    controller.batcher.max_wait = 0
+    controller.submit_nodes(list(controller.submittable_nodes()))
+    controller.sync_backend()
+    assert siblings[4].successful()
+    assert controller.batcher.holding == 0
+
+def test_deduplicate():
+    from adage.taskkeys import task_key
+    assert task_key(task.s(one = 1)) == task_key(task.s(one = 1))
+    assert task_key(task.s(one = 1)) != task_key(task.s(one = 2))
+    assert task_key(lambda: None) is None
+    assert task_key(task.s(one = {1: 'a'})) != task_key(task.s(one = {'1': 'a'}))
+    assert task_key(task.s(one = (1, 2))) != task_key(task.s(one = [1, 2]))
+    assert task_key(functools.partial(syncbackend().result, {'result': 1})) is None
+
+    adageobj = adage.adageobject()
+    dag = adageobj.dag
+    nodes = [dag.addTask(task.s(one = 'same'), nodename = 'node') for i in range(3)]
+    other = dag.addTask(task.s(one = 'other'), nodename = 'node')
+    backend = syncbackend()
+    controller = adage.BaseController(adageobj, backend, deduplicate = True)
+    controller.submit_nodes(list(controller.submittable_nodes()))
+    assert len(backend.submitted) == 2
+    controller.submit_nodes(list(controller.submittable_nodes()))
+    assert len(backend.submitted) == 2
+    assert controller.dedup_stats == {'hits': 2, 'misses': 2}
+    controller.sync_backend()
+    assert all(n.successful() for n in nodes + [other])
+    assert nodes[1].resultproxy is nodes[0].resultproxy
+
+    from adage.backends import CompletionQueue
+    backend.completions = CompletionQueue()
+    late = dag.addTask(task.s(one = 'same'), nodename = 'node')
+    controller.submit_nodes(list(controller.submittable_nodes()))
+    assert late.resultproxy is nodes[0].resultproxy
+    assert backend.completions.wait(timeout = 0.01) == 1
+
+def test_result_cache(tmpdir):
+    from adage.resultcache import ResultCache, CachingBackend
+
+    def run(salt = ''):
+        adageobj = adage.adageobject()
+        one = adageobj.dag.addTask(task.s(one = 'one'), nodename = 'one')
+        adageobj.dag.addTask(task.s(one = 'two'), nodename = 'two', depends_on = [one])
+        inner = syncbackend()
+        backend = CachingBackend(inner, ResultCache(str(tmpdir), salt = salt))
+        controller = adage.BaseController(adageobj, backend)
+        while not controller.finished():
+            controller.submit_nodes(list(controller.submittable_nodes()))
+            controller.sync_backend()
+        assert controller.successful()
+        return inner, backend
+
+    inner, backend = run()
+    assert len(inner.submitted) == 2
+    inner, backend = run()
+    assert len(inner.submitted) == 0
+    assert backend.stats == {'hits': 2, 'misses': 0}
+    inner, backend = run(salt = 'v2')
+    assert len(inner.submitted) == 2
+
+    cache = ResultCache(str(tmpdir.join('lru')))
+    for i, key in enumerate(['c','b','a']):
+        cache.put(key, 'x'*100)
+        os.utime(cache._path(key), (2-i, 2-i))
+    # a reopened cache orders its entries by their last use on disk
+    entrysize = os.path.getsize(cache._path('a'))
+    cache = ResultCache(str(tmpdir.join('lru')), max_bytes = 3 * entrysize)
+    assert cache.size() == 3 * entrysize
+    cache.get('a')
+    cache.put('d', 'x'*100)
+    assert cache.size() == 3 * entrysize
+    assert cache.get('a')[0] and cache.get('c')[0] and cache.get('d')[0]
+    assert not cache.get('b')[0]
+
+def test_journal(tmpdir):
+    from adage.journal import Journal, resume
+    adageobj = adage.adageobject()
+    one = adageobj.dag.addTask(task.s(one = 'one'), nodename = 'one')
+
+    def addtwo(adageobj):
+        adageobj.dag.addTask(task.s(one = 'two'), nodename = 'two', depends_on = [adageobj.dag.getNodeByName('one')])
+    rule = adage.Rule(lambda adageobj: adageobj.dag.getNodeByName('one').successful(), addtwo)
+    adageobj.rules.append(rule)
+
+    nodeserializer = lambda n: adage.serialize.node_to_json(n, lambda t: t.keywords, lambda p: {})
+    nodedeserializer = lambda n: adage.node.Node(n['name'], task.s(**n['task']), n['id'])
+    journal = Journal(str(tmpdir), nodeserializer, lambda r: 'addtwo', proxyserializer = lambda p: p, snapshot_every = 5)
+    journal.initialize(adageobj)
+    controller = adage.BaseController(adageobj, syncbackend())
+    controller.submit_nodes([one])
+    controller.sync_backend()
+    journal.track(adageobj)
+    controller.apply_rules([rule])
+    journal.track(adageobj)
+    adageobj.dag.addTask(task.s(one = 'three'), nodename = 'three')
+
+    assert len(tmpdir.listdir()) == 2
+    resumed = resume(str(tmpdir), nodedeserializer, lambda r: adage.Rule(rule.predicate, addtwo), lambda p: p)
+    assert len(resumed.rules) == 0 and len(resumed.applied_rules) == 1
+    assert sorted(resumed.dag.getNode(n).name for n in resumed.dag.nodes()) == ['one', 'two']
+    assert resumed.dag.getNodeByName('one').successful()
+    assert resumed.dag.getNodeByName('one').submit_time == one.submit_time
+    assert list(resumed.dag.predecessors(resumed.dag.getNodeByName('two').identifier)) == [one.identifier]
+
+    controller = adage.BaseController(resumed, syncbackend())
+    assert [n.name for n in controller.submittable_nodes()] == ['two']
+
+def test_streaming_snapshot(tmpdir):
+    from adage.serialize import open_snapshot, write_snapshot, read_snapshot
+    adageobj = adage.adageobject()
+    one = adageobj.dag.addTask(task.s(one = 'one'), nodename = 'one')
+    for i in range(5):
+        adageobj.dag.addTask(task.s(one = i), nodename = 'child', depends_on = [one])
+    one._state = adage.nodestate.FAILED
+    adageobj.rules.append(rl())
+
+    nodeserializer = lambda n: adage.serialize.node_to_json(n, lambda t: t.keywords, lambda p: {})
+    def nodedeserializer(data):
+        nodeobj = adage.node.Node(data['name'], task.s(**data['task']), data['id'])
+        adage.serialize.set_generic_data(nodeobj, data)
+        return nodeobj
+
+    filename = str(tmpdir.join('snapshot.jsonl.gz'))
+    with open_snapshot(filename, 'wb') as f:
+        write_snapshot(adageobj, f, lambda r: 'rule', nodeserializer, chunksize = 2)
+    with open_snapshot(filename) as f:
+        loaded = read_snapshot(f, nodedeserializer, lambda r: rl())
+    assert sorted(loaded.dag.edges()) == sorted(adageobj.dag.edges())
+    assert len(loaded.rules) == 1 and len(loaded.applied_rules) == 0
+    assert all(loaded.dag.upstreamFailed(loaded.dag.getNode(n)) for n in loaded.dag.successors(one.identifier))
+
+def test_compact_nodes():
+    nodes = [adage.node.Node('node', task.s(one = i)) for i in range(100)]
+    assert len(set(n.identifier for n in nodes)) == 100
+    assert not hasattr(nodes[0], '__dict__')
+    nodes[0]._state = adage.nodestate.FAILED
+    assert nodes[0].state is adage.nodestate.FAILED and nodes[0].ready() and not nodes[0].successful()
+    assert nodes[1].state is adage.nodestate.DEFINED and not nodes[1].ready()
+
+def test_arraydag():
+    from adage.graph import ArrayDAG
+    adageobj = adage.adageobject(dagclass = ArrayDAG)
+    dag = adageobj.dag
+    one = dag.addTask(failing, nodename = 'one')
+    two = dag.addTask(task.s(one = 'two'), nodename = 'two', depends_on = [one])
+    three = dag.addTask(task.s(one = 'three'), nodename = 'three', depends_on = [one, two])
+    four = dag.addTask(task.s(one = 'four'), nodename = 'four')
+    assert sorted(dag.predecessors(three.identifier)) == sorted([one.identifier, two.identifier])
+    assert dag.in_degree(three.identifier) == 2 and dag.out_degree(one.identifier) == 2
+    order = list(dag.topologicalSort())
+    assert all(order.index(a) < order.index(b) for a, b in dag.edges())
+
+    controller = adage.BaseController(adageobj, syncbackend())
+    controller.submit_nodes(list(controller.submittable_nodes()))
+    controller.sync_backend()
+    assert dag.upstreamFailed(two) and dag.upstreamFailed(three) and not dag.upstreamFailed(four)
+    assert controller.finished() and not controller.successful()
+
+    dag.removeNode(one)
+    assert len(dag) == 3 and dag.number_of_edges() == 1
+    assert not dag.upstreamFailed(two) and not dag.upstreamFailed(three)
+    assert [n.name for n in controller.submittable_nodes()] == ['two']
+
+    graph = dag.to_networkx()
+    assert sorted(graph.edges()) == sorted(dag.edges())
+    assert graph.nodes[two.identifier]['nodeobj'] is two
+
+def test_secondary_indexes():
+    for index_nodes in [False, True]:
+        adageobj = adage.adageobject(dag = adage.graph.AdageDAG(index_nodes = index_nodes))
+        dag = adageobj.dag
+        one = dag.addTask(task.s(one = 'one'), nodename = 'one', tags = ['stage1'])
+        two = dag.addTask(task.s(one = 'two'), nodename = 'two', depends_on = [one], tags = ['stage2'])
+        other = dag.addTask(task.s(one = 'other'), nodename = 'two', tags = ['stage2'])
+        assert dag.getNodeByName('one') is one
+        assert dag.getNodeByName('two', nodefilter = lambda n: n.identifier == other.identifier) is other
+        assert dag.getNodesByTag('stage2') == [two, other]
+        assert dag.getNodesByState(adage.nodestate.DEFINED) == [one, two, other]
+
+        controller = adage.BaseController(adageobj, syncbackend())
+        controller.submit_nodes([one])
+        controller.sync_backend()
+        assert dag.getNodesByState(adage.nodestate.SUCCESS) == [one]
+        assert dag.getNodesByState(adage.nodestate.DEFINED) == [two, other]
+
+        dag.removeNode(other)
+        assert dag.getNodesByName('two') == [two]
+        assert dag.getNodesByTag('stage2') == [two]
+
+def test_incremental_topological_order():
+    from adage.graph import ArrayDAG
+    for dag in [adage.graph.AdageDAG(), ArrayDAG()]:
+        nodes = [dag.addTask(task.s(one = i), nodename = str(i)) for i in range(6)]
+        for a, b in [(5,4),(4,3),(0,5),(3,1),(2,1),(5,2)]:
+            dag.addEdge(nodes[a], nodes[b])
+        order = dag.topologicalSort()
+        assert sorted(order) == sorted(dag.nodes())
+        assert all(order.index(a) < order.index(b) for a, b in dag.edges())
+        try:
+            dag.addEdge(nodes[1], nodes[0])
+            assert False
+        except RuntimeError:
+            pass
+        assert (nodes[1].identifier, nodes[0].identifier) not in list(dag.edges())
+        dag.removeNode(nodes[3])
+        assert dag.topologicalSort([nodes[1].identifier, nodes[0].identifier]) == [nodes[0].identifier, nodes[1].identifier]
+
+def test_copied_graph():
+    adageobj = adage.adageobject()
+    dag = adageobj.dag
+    one = dag.addTask(failing, nodename = 'one', tags = ['first'])
+    two = dag.addTask(task.s(one = 'two'), nodename = 'two', depends_on = [one])
+    controller = adage.BaseController(adageobj, syncbackend())
+    controller.submit_nodes([one])
+    controller.sync_backend()
+
+    for copied in [dag.copy(), adage.graph.AdageDAG(dag), dag.subgraph(dag.nodes()).copy()]:
+        assert copied.getNodeByName('one') is one
+        assert copied.getNodesByState(adage.nodestate.FAILED) == [one]
+        assert copied.upstreamFailed(two)
+        three = copied.addTask(task.s(one = 'three'), nodename = 'three', depends_on = [two])
+        assert copied.upstreamFailed(three)
+        assert copied.topologicalSort() == [one.identifier, two.identifier, three.identifier]
+    assert dag.copy().getNodesByTag('first') == [one]
+    assert dag.getNodeByName('three') is None
+
+def test_bulk_construction():
+    from adage.graph import ArrayDAG
+    for dagclass in [adage.graph.AdageDAG, ArrayDAG]:
+        adageobj = adage.adageobject(dagclass = dagclass)
+        dag = adageobj.dag
+        controller = adage.BaseController(adageobj, syncbackend())
+        root = dag.addTask(failing, nodename = 'root')
+        other = dag.addTask(task.s(one = 'other'), nodename = 'other')
+        assert [n.name for n in controller.submittable_nodes()] == ['root', 'other']
+
+        scattered = dag.scatter(task, [{'one': i} for i in range(10)], nodename = 'scatter', depends_on = [root], tags = ['scatter'])
+        assert [n.task.keywords for n in scattered] == [{'one': i} for i in range(10)]
+        assert dag.getNodesByTag('scatter') == scattered
+        merged = dag.addTasks([(task.s(one = 'merge'), 'merge', scattered + [other, other])])[0]
+        assert len(list(dag.predecessors(merged.identifier))) == 11
+        assert [n.name for n in controller.submittable_nodes()] == ['root', 'other']
+
+        controller.submit_nodes([root])
+        controller.sync_backend()
+        assert all(dag.upstreamFailed(n) for n in scattered + [merged])
+
+def test_nodetable():
+    import pytest
+    np = pytest.importorskip('numpy')
+    import adage.visualize
+    adageobj = adage.adageobject()
+    dag = adageobj.dag
+    one = dag.addTask(task.s(one = 'one'), nodename = 'one')
+    two = dag.addTask(failing, nodename = 'two', depends_on = [one])
+    three = dag.addTask(task.s(one = 'three'), nodename = 'three', depends_on = [two])
+    controller = adage.BaseController(adageobj, syncbackend())
+    table = controller.nodetable
+    while not controller.finished():
+        controller.submit_nodes(list(controller.submittable_nodes()))
+        controller.sync_backend()
+
+    assert table.counts() == {adage.nodestate.DEFINED: 1, adage.nodestate.RUNNING: 0,
+                              adage.nodestate.FAILED: 1, adage.nodestate.SUCCESS: 1}
+    assert len(table.runtimes()) == 2 and len(table.queue_waits()) == 2
+    start, stop = table.time_range()
+    for t in np.linspace(start - 1, stop + 1, 7):
+        expected = {n: adage.visualize.state_at_time(dag.getNode(n), t) for n in dag.nodes()}
+        assert table.node_states_at(t) == expected
+    assert list(table.running_at([one.submit_time, stop + 1])) == [1, 0]
+
+    dag.removeNode(three)
+    assert table.counts()[adage.nodestate.DEFINED] == 0
+
+def test_duplicate_edges():
+    adageobj = adage.adageobject()
+    dag = adageobj.dag
+    parent = dag.addTask(task.s(one = 'parent'), nodename = 'parent')
+    controller = adage.BaseController(adageobj, syncbackend())
+    assert controller.readyqueue
+    child = dag.addTask(task.s(one = 'child'), nodename = 'child', depends_on = [parent, parent])
+    dag.addEdge(parent, child)
+    assert controller.readyqueue.pending[child.identifier] == 1
+    while not controller.finished():
+        controller.submit_nodes(list(controller.submittable_nodes()))
+        controller.sync_backend()
+    assert controller.successful() and child.successful()
+
+def test_rejected_edges():
+    from adage.graph import ArrayDAG
+    for dagclass in [adage.graph.AdageDAG, ArrayDAG]:
+        adageobj = adage.adageobject(dagclass = dagclass)
+        dag = adageobj.dag
+        a = dag.addTask(task.s(one = 'a'), nodename = 'a')
+        c = dag.addTask(task.s(one = 'c'), nodename = 'c')
+        controller = adage.BaseController(adageobj, syncbackend())
+        try:
+            dag.addEdges([(c, a), (a, c)])
+            assert False
+        except RuntimeError:
+            pass
+        assert list(dag.edges()) == []
+        assert [n.name for n in controller.submittable_nodes()] == ['a', 'c']
+        dag.addEdge(c, a)
+        assert list(dag.edges()) == [(c.identifier, a.identifier)]